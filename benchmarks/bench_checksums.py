@@ -0,0 +1,36 @@
+import hashlib
+import time
+
+from digslash import nodes
+
+
+SIZES = (1000, 10000, 100000, 1000000)
+ROUNDS = 20000000
+
+
+def legacy(content):
+    # Node.checksum before hashing the raw bytes: decode in __init__, encode again for MD5
+    return hashlib.md5(content.decode('utf-8').encode('utf-8')).hexdigest()
+
+
+def measure(function, *args):
+    content = args[0]
+    iterations = max(10, ROUNDS // len(content))
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(*args)
+    elapsed = time.perf_counter() - start
+    return iterations * len(content) / elapsed / 1000000
+
+
+def main():
+    for size in SIZES:
+        content = (b'<a href="/page">Page</a>\n' * (size // 25 + 1))[:size]
+        row = ['{:>8} bytes'.format(size), 'legacy {:8.0f} MB/s'.format(measure(legacy, content))]
+        for algorithm in nodes.HASH_ALGORITHMS:
+            row.append('{} {:8.0f} MB/s'.format(algorithm, measure(nodes.checksum, content, algorithm)))
+        print('  '.join(row))
+
+
+if __name__ == '__main__':
+    main()
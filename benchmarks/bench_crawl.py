@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import sys
+import time
+
+from benchmarks import synthetic
+from digslash import (
+    caches,
+    logger,
+    sites,
+)
+
+
+# Compared metrics and whether a higher value is better
+METRICS = (
+    ('pages_per_second', True),
+    ('latency_p50', False),
+    ('latency_p99', False),
+    ('peak_rss_kb', False),
+    ('cpu_per_page', False),
+)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def crawl(base, options):
+    site = sites.Site(base, limit=0, **options)
+    latencies = list()
+    fetch = site.fetch
+
+    async def fetch_timed(url, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await fetch(url, *args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    site.fetch = fetch_timed
+    await site.crawl()
+    return site, latencies
+
+
+def run(synthetic_site, options):
+    with synthetic.Server(synthetic_site) as server:
+        started = time.perf_counter()
+        # Thread CPU time leaves out the server, which runs in its own thread
+        cpu_started = time.thread_time()
+        site, latencies = asyncio.run(crawl(server.base, options))
+        cpu = time.thread_time() - cpu_started
+        elapsed = time.perf_counter() - started
+    pages = len(site.results)
+    return {
+        'pages': pages,
+        'fetches': len(latencies),
+        'seconds': elapsed,
+        'pages_per_second': pages / elapsed,
+        'latency_p50': percentile(latencies, 0.5),
+        'latency_p99': percentile(latencies, 0.99),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'cpu_per_page': cpu / pages if pages else 0.0,
+    }
+
+
+def compare(report, baseline, tolerance):
+    regressions = list()
+    for name, higher_is_better in METRICS:
+        value, previous = report[name], baseline.get(name)
+        if not previous:
+            continue
+        change = (value - previous) / previous
+        print('{:>18}  {:12.4f}  baseline {:12.4f}  {:+7.1%}'.format(name, value, previous, change), file=sys.stderr)
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Crawl a synthetic site served in-process')
+    parser.add_argument('--pages', type=int, default=10000)
+    parser.add_argument('--fanout', type=int, default=10)
+    parser.add_argument('--duplicates', type=float, default=0.1, help='share of pages with an identical alias URL')
+    parser.add_argument('--page-size', type=int, default=8192)
+    parser.add_argument('--latency', type=float, default=0.0, help='mean server latency in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--parser-backend', default='bs4')
+    parser.add_argument('--incremental', action='store_true')
+    parser.add_argument('--parse-cache', type=int, default=0, help='parse cache size, 0 disables it')
+    parser.add_argument('--output', help='append the report as a JSON line')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed relative regression')
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+    synthetic_site = synthetic.SyntheticSite(
+        pages=args.pages,
+        fanout=args.fanout,
+        duplicate_ratio=args.duplicates,
+        page_size=args.page_size,
+        latency=args.latency,
+        seed=args.seed,
+    )
+    options = dict(workers_no=args.workers, parser_backend=args.parser_backend, incremental=args.incremental)
+    if args.parse_cache:
+        options['parse_cache'] = caches.ParseCache(args.parse_cache)
+    report = run(synthetic_site, options)
+    if args.parse_cache:
+        report['parse_cache'] = options['parse_cache'].info()
+    report['config'] = dict(vars(args), output=None, baseline=None)
+    line = json.dumps(report, sort_keys=True)
+    print(line)
+    if args.output:
+        with open(args.output, 'a') as fil:
+            fil.write(line + '\n')
+    if args.baseline:
+        with open(args.baseline) as fil:
+            baseline = json.loads(fil.read().splitlines()[-1])
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print('Regressed: {}'.format(', '.join(regressions)), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
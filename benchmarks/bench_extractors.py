@@ -0,0 +1,40 @@
+import time
+
+from digslash import (
+    extractors,
+    nodes,
+    sites,
+)
+
+
+PAGES = 200
+LINKS_PER_PAGE = 200
+
+
+def make_page(links):
+    rows = list()
+    for i in range(links):
+        rows.append('<div class="row"><p>Paragraph {0}</p><a href="/page/{0}.html">Page {0}</a></div>'.format(i))
+        if i % 10 == 0:
+            rows.append('<img src="/img/{0}.png" srcset="/img/{0}-2x.png 2x">'.format(i))
+            rows.append('<script>fetch("/api/{}.json");</script>'.format(i))
+    return '<!DOCTYPE html><html><head><title>Bench</title></head><body>{}</body></html>'.format(''.join(rows)).encode()
+
+
+def main():
+    content = make_page(LINKS_PER_PAGE)
+    for name, options in (
+        ('default', dict()),
+        ('html', dict(parser_backend='html')),
+        ('extended', dict(extractors=extractors.EXTRACTORS)),
+    ):
+        site = sites.Site('https://example.com/', **options)
+        start = time.perf_counter()
+        for _ in range(PAGES):
+            results = nodes.Node(site, content, current='https://example.com/index.html', content_type='text/html').process()
+        elapsed = time.perf_counter() - start
+        print('{:>8}  {:8.1f} pages/s  ({} links per page)'.format(name, PAGES / elapsed, len(results['links'])))
+
+
+if __name__ == '__main__':
+    main()
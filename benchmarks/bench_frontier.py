@@ -0,0 +1,36 @@
+import asyncio
+import time
+
+from digslash import (
+    frontiers,
+    sites,
+)
+
+
+SIZES = (10000, 100000, 1000000)
+
+
+async def enqueue(size, frontier_class):
+    site = sites.Site('https://example.com/')
+    site.queue = frontier_class()
+    links = ['https://example.com/page/{}'.format(i) for i in range(size)]
+    start = time.perf_counter()
+    # Every link is offered twice, the second pass must be rejected by the index
+    site.queue_add(links, 'https://example.com/')
+    site.queue_add(links, 'https://example.com/')
+    elapsed = time.perf_counter() - start
+    assert site.queue.qsize() == size
+    return elapsed
+
+
+def main():
+    for frontier_class in (frontiers.Frontier, frontiers.PriorityFrontier):
+        for size in SIZES:
+            elapsed = asyncio.run(enqueue(size, frontier_class))
+            print('{:>16} {:>8} links  {:8.3f}s  {:>12.0f} links/s'.format(
+                frontier_class.__name__, size, elapsed, size * 2 / elapsed
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import asyncio
+import gc
+import hashlib
+import sys
+import tracemalloc
+
+from digslash import sites
+
+
+SIZE = 200000
+
+
+async def fill(site, links):
+    site.queue = site.frontier_create()
+    site.queue_add(links[:1])
+    for i, url in enumerate(links):
+        url, source = site.queue.get_nowait()
+        site.queue_add(links[i * 4 + 1:i * 4 + 5], url)
+        results = {
+            'encoding': 'utf-8',
+            'checksum': hashlib.md5(url.encode()).hexdigest(),
+            'links': set(),
+        }
+        site.done(url, source, results, None, None)
+        site.queue.task_done()
+
+
+def measure(compact, links):
+    gc.collect()
+    tracemalloc.start()
+    site = sites.Site('https://example.com/', compact=compact)
+    asyncio.run(fill(site, links))
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(site.results) == len(links)
+    return used
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else SIZE
+    # URL strings are created up front, only the structures around them are measured
+    links = ['https://example.com/section-{}/page-{}.html'.format(i % 97, i) for i in range(size)]
+    for compact in (False, True):
+        used = measure(compact, links)
+        print('compact={!s:<5}  {:>8} URLs  {:8.1f} MiB  {:6.1f} bytes/URL'.format(
+            compact, size, used / 2 ** 20, used / size
+        ))
+
+
+if __name__ == '__main__':
+    main()
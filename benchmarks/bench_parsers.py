@@ -0,0 +1,34 @@
+import time
+
+from digslash import (
+    nodes,
+    sites,
+)
+
+
+PAGES = 200
+LINKS_PER_PAGE = 200
+
+
+def make_page(links):
+    rows = list()
+    for i in range(links):
+        rows.append('<div class="row"><p>Paragraph {0}</p><a href="/page/{0}.html">Page {0}</a></div>'.format(i))
+        if i % 10 == 0:
+            rows.append('<script src="/static/{}.js"></script><form action="/form/{}"></form>'.format(i, i))
+    return '<!DOCTYPE html><html><head><title>Bench</title></head><body>{}</body></html>'.format(''.join(rows)).encode()
+
+
+def main():
+    content = make_page(LINKS_PER_PAGE)
+    for backend in nodes.Node.PARSER_BACKENDS:
+        site = sites.Site('https://example.com/', parser_backend=backend)
+        start = time.perf_counter()
+        for _ in range(PAGES):
+            nodes.Node(site, content, current='https://example.com/index.html').process()
+        elapsed = time.perf_counter() - start
+        print('{:>6}  {:8.1f} pages/s  ({} bytes per page)'.format(backend, PAGES / elapsed, len(content)))
+
+
+if __name__ == '__main__':
+    main()
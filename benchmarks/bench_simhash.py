@@ -0,0 +1,60 @@
+import hashlib
+import random
+import time
+
+from digslash import fingerprints
+
+
+PAGES = 200
+PAGE_SIZE = 8192
+
+
+def make_pages():
+    rng = random.Random(0)
+    words = ['word{}'.format(i) for i in range(5000)]
+    pages = list()
+    for _ in range(PAGES):
+        text = list()
+        size = 0
+        while size < PAGE_SIZE:
+            word = rng.choice(words)
+            text.append(word)
+            size += len(word) + 1
+        pages.append(' '.join(text))
+    return pages
+
+
+def legacy(features, bits=64):
+    # One pass over all the bits of every feature, before the bit-sliced counters
+    vector = [0] * bits
+    for feature in features:
+        value = int.from_bytes(hashlib.blake2b(feature.encode('utf-8', 'replace'), digest_size=bits // 8).digest(), 'big')
+        for bit in range(bits):
+            if value >> bit & 1:
+                vector[bit] += 1
+            else:
+                vector[bit] -= 1
+    fingerprint = 0
+    for bit in range(bits):
+        if vector[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def measure(shingled, function):
+    start = time.perf_counter()
+    fingerprints_list = [function(features) for features in shingled]
+    return (time.perf_counter() - start) / len(shingled), fingerprints_list
+
+
+def main():
+    shingled = [fingerprints.shingles(page) for page in make_pages()]
+    legacy_seconds, expected = measure(shingled, legacy)
+    print('legacy   {:8.3f} ms/page'.format(legacy_seconds * 1000))
+    seconds, computed = measure(shingled, fingerprints.simhash)
+    print('simhash  {:8.3f} ms/page  {:.1f}x'.format(seconds * 1000, legacy_seconds / seconds))
+    assert computed == expected
+
+
+if __name__ == '__main__':
+    main()
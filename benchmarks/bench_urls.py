@@ -0,0 +1,79 @@
+import random
+import time
+import urllib.parse
+
+from digslash import (
+    nodes,
+    sites,
+)
+
+
+LINKS = 100000
+PAGES = 1000
+
+
+def make_corpus():
+    # A site-wide navigation repeated on every page plus page-specific links
+    rng = random.Random(0)
+    navigation = ['/section/{}/index.html'.format(i) for i in range(50)]
+    corpus = list()
+    while len(corpus) < LINKS:
+        page = 'https://example.com/section/{}/page-{}.html'.format(rng.randrange(50), rng.randrange(PAGES))
+        links = navigation + [
+            'item-{}.html?b={}&a={}'.format(rng.randrange(PAGES), rng.randrange(9), rng.randrange(9)) for _ in range(30)
+        ] + [
+            'https://example.com/static/{}.js'.format(rng.randrange(20)),
+            'mailto:office@example.com',
+            'http://example.net/external.html',
+        ]
+        corpus.append((page, links))
+        corpus_size = sum(len(links) for page, links in corpus)
+        if corpus_size >= LINKS:
+            break
+    return corpus
+
+
+def legacy(site, node, links):
+    # Node.links_filter and Node.links_rebase before the single-pass resolver
+    refined = set()
+    for link in links:
+        url = urllib.parse.urlparse(link)
+        discard = False
+        if url.scheme not in ['http', 'https'] and url.scheme != '':
+            discard = True
+        for sep in site.paths_ignored:
+            if sep in url.path or (not url.netloc and sep in link):
+                discard = True
+                break
+        if not discard and (url.netloc == node.current.netloc or not url.netloc):
+            refined.add(link)
+    rebased = set()
+    for link in refined:
+        split_url = urllib.parse.urlsplit(link)
+        rebased.add(urllib.parse.urljoin(
+            site.base, urllib.parse.SplitResult('', '', split_url.path, split_url.query, split_url.fragment).geturl()
+        ))
+    return rebased
+
+
+def measure(corpus, function):
+    site = sites.Site('https://example.com/')
+    nodes_list = [(nodes.Node(site, b'', current=page), links) for page, links in corpus]
+    start = time.perf_counter()
+    count = 0
+    for node, links in nodes_list:
+        function(site, node, links)
+        count += len(links)
+    return count / (time.perf_counter() - start), site
+
+
+def main():
+    corpus = make_corpus()
+    rate, site = measure(corpus, legacy)
+    print('legacy    {:10.0f} links/s'.format(rate))
+    rate, site = measure(corpus, lambda site, node, links: node.links_resolve(links))
+    print('resolver  {:10.0f} links/s  {}'.format(rate, site.urls.cache_info()))
+
+
+if __name__ == '__main__':
+    main()
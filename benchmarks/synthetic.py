@@ -0,0 +1,120 @@
+import asyncio
+import random
+import threading
+
+from aiohttp import web
+
+
+WORDS = (
+    'lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do',
+    'eiusmod', 'tempor', 'incididunt', 'ut', 'labore', 'et', 'dolore', 'magna', 'aliqua',
+)
+
+
+# Page 0 is the root and every page links to its children in a tree of the given fan-out, so all
+# pages are reachable, with half as many random cross links on top. A duplicate_ratio share of pages
+# also links to an alias URL serving the very same bytes. Pages are rendered on request only.
+class SyntheticSite:
+
+    def __init__(self, pages=10000, fanout=10, duplicate_ratio=0.1, page_size=8192, latency=0.0, jitter=0.5, seed=0):
+        self.pages = pages
+        self.fanout = fanout
+        self.duplicate_ratio = duplicate_ratio
+        self.page_size = page_size
+        self.latency = latency
+        self.jitter = jitter
+        self.seed = seed
+
+    def random(self, page):
+        return random.Random(self.seed * 1000003 + page)
+
+    def links(self, page):
+        rng = self.random(page)
+        first = page * self.fanout + 1
+        links = ['/p/{}.html'.format(child) for child in range(first, min(first + self.fanout, self.pages))]
+        for _ in range(self.fanout // 2):
+            links.append('/p/{}.html'.format(rng.randrange(self.pages)))
+        if rng.random() < self.duplicate_ratio:
+            links.append('/p/{}.html?alias=1'.format(page))
+        return links
+
+    def body(self, page):
+        rng = self.random(page)
+        links = ''.join('<li><a href="{0}">{0}</a></li>'.format(link) for link in self.links(page))
+        head = '<!DOCTYPE html><html><head><title>Page {}</title></head><body><ul>{}</ul>'.format(page, links)
+        tail = '</body></html>'
+        text = list()
+        size = len(head) + len(tail)
+        while size < self.page_size:
+            paragraph = '<p>{}</p>'.format(' '.join(rng.choice(WORDS) for _ in range(40)))
+            text.append(paragraph)
+            size += len(paragraph)
+        return (head + ''.join(text) + tail).encode()
+
+    def delay(self, page):
+        if not self.latency:
+            return 0
+        rng = random.Random(self.seed * 7919 + page)
+        return max(0.0, self.latency * (1 + rng.uniform(-self.jitter, self.jitter)))
+
+    async def handle(self, request):
+        name = request.match_info.get('page')
+        try:
+            page = 0 if name is None else int(name)
+        except ValueError:
+            raise web.HTTPNotFound()
+        if not 0 <= page < self.pages:
+            raise web.HTTPNotFound()
+        delay = self.delay(page)
+        if delay:
+            await asyncio.sleep(delay)
+        return web.Response(body=self.body(page), content_type='text/html', charset='utf-8')
+
+    def application(self):
+        app = web.Application()
+        app.router.add_get('/', self.handle)
+        app.router.add_get('/p/{page}.html', self.handle)
+        return app
+
+
+# Serves from a thread with its own event loop, so the crawler loop is not shared
+class Server:
+
+    def __init__(self, site, host='127.0.0.1', port=0):
+        self.site = site
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.runner = None
+        self.thread = None
+        self.ready = threading.Event()
+
+    @property
+    def base(self):
+        return 'http://{}:{}/'.format(self.host, self.port)
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.setup())
+        self.ready.set()
+        self.loop.run_forever()
+        self.loop.run_until_complete(self.runner.cleanup())
+        self.loop.close()
+
+    async def setup(self):
+        self.runner = web.AppRunner(self.site.application(), access_log=None)
+        await self.runner.setup()
+        tcp_site = web.TCPSite(self.runner, self.host, self.port)
+        await tcp_site.start()
+        self.port = self.runner.addresses[0][1]
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return self
+
+    def __exit__(self, *args):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
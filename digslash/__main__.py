@@ -0,0 +1,6 @@
+import sys
+
+from digslash import cli
+
+
+sys.exit(cli.main())
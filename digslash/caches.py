@@ -0,0 +1,91 @@
+import collections
+import hashlib
+import json
+import sqlite3
+
+
+def fingerprint(*parts):
+    # Links are only valid for the extraction configuration that produced them, it is part of every key
+    return hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=8).hexdigest()
+
+
+class ParseCache:
+
+    def __init__(self, size=4096, path=None, batch_size=1000):
+        self.size = size
+        self.path = path
+        self.batch_size = batch_size
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.pending = list()
+        self.users = 0
+        self.connection = None
+        self.connect()
+
+    def connect(self):
+        if self.path is None or self.connection is not None:
+            return
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS parses (key TEXT PRIMARY KEY, links TEXT)')
+        self.connection.commit()
+
+    def open(self):
+        # Sites sharing the cache each open it, the last one to close it closes the connection
+        self.users += 1
+        self.connect()
+
+    def get(self, key):
+        links = self.entries.get(key)
+        if links is not None:
+            self.entries.move_to_end(key)
+        elif self.connection is not None:
+            row = self.connection.execute('SELECT links FROM parses WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                links = tuple(json.loads(row[0]))
+                self.remember(key, links)
+        if links is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return links
+
+    def put(self, key, links):
+        links = tuple(links)
+        self.remember(key, links)
+        if self.connection is not None:
+            self.pending.append((key, json.dumps(links)))
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def remember(self, key, links):
+        self.entries[key] = links
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def info(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'ratio': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.entries),
+        }
+
+    def flush(self):
+        if self.connection is not None and self.pending:
+            with self.connection:
+                self.connection.executemany('INSERT OR REPLACE INTO parses VALUES (?, ?)', self.pending)
+            self.pending.clear()
+
+    def close(self):
+        self.flush()
+        if self.users > 1:
+            self.users -= 1
+            return
+        self.users = 0
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
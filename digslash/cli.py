@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sys
+import time
+
+from digslash import (
+    NAME,
+    __version__,
+    logger,
+    nodes,
+)
+
+
+# Heavy modules (aiohttp, bs4) are only imported once the arguments are known to be valid
+
+
+def parser_create():
+    parser = argparse.ArgumentParser(prog=NAME, description='Crawl sites and stream the results as NDJSON')
+    parser.add_argument('seeds', nargs='*', metavar='URL', help='base URLs to crawl')
+    parser.add_argument('-i', '--input', help='file with one base URL per line, - for stdin')
+    parser.add_argument('-o', '--output', default='-', help='NDJSON output file, - for stdout (default)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='no progress on stderr')
+    parser.add_argument('-v', '--verbose', action='count', default=0)
+    parser.add_argument('--version', action='version', version='%(prog)s {}'.format(__version__))
+    parser.add_argument('--progress-interval', type=float, default=1.0)
+    parser.add_argument('--no-uvloop', action='store_true', help='keep the default event loop')
+
+    crawl = parser.add_argument_group('crawl')
+    crawl.add_argument('--workers', type=int, default=16, help='workers per site')
+    crawl.add_argument('--limit', type=int, default=100, help='results per site, 0 for no limit')
+    crawl.add_argument('--concurrency', type=int, default=64, help='requests in flight across all sites')
+    crawl.add_argument('--no-deduplicate', action='store_true')
+    crawl.add_argument('--incremental', action='store_true')
+    crawl.add_argument('--parser-backend', default='bs4', choices=nodes.Node.PARSER_BACKENDS)
+    crawl.add_argument('--extractors', action='store_true', help='content-type aware link extraction')
+    crawl.add_argument('--seed-robots', action='store_true', help='seed from robots.txt and sitemap.xml')
+    crawl.add_argument('--max-depth', type=int)
+    crawl.add_argument('--prefix-limit', type=int, help='URLs per first path segment')
+    crawl.add_argument('--deadline', type=float, help='seconds before the crawl drains')
+    crawl.add_argument('--drain-timeout', type=float, default=10)
+    crawl.add_argument('--processes', type=int, default=0, help='parse in a process pool of this size')
+    crawl.add_argument('--near-duplicates-distance', type=int)
+    crawl.add_argument('--hash-algorithm', default='md5', choices=sorted(nodes.HASH_ALGORITHMS))
+    crawl.add_argument('--compact', action='store_true')
+    crawl.add_argument('--parse-cache', type=int, default=0, help='parse cache size, 0 disables it')
+    crawl.add_argument('--parse-cache-path')
+    crawl.add_argument('--previous', metavar='PATH', help='NDJSON output of an earlier run with --store-links to recrawl')
+    crawl.add_argument('--state', help='state database for resuming, suffixed per seed if there are several')
+    store = crawl.add_mutually_exclusive_group()
+    store.add_argument('--record', metavar='PATH', help='record every response to a fetch store')
+    store.add_argument('--replay', metavar='PATH', help='serve responses from a fetch store, no network')
+
+    output = parser.add_argument_group('output')
+    output.add_argument('--store-content', action='store_true')
+    output.add_argument('--store-headers', action='store_true')
+    output.add_argument('--store-links', action='store_true')
+    output.add_argument('--stats', help='stats snapshots file')
+    output.add_argument('--stats-format', default='json', choices=('json', 'prometheus'))
+    output.add_argument('--stats-interval', type=float, default=10.0)
+
+    http = parser.add_argument_group('http')
+    http.add_argument('--content-types', nargs='+', metavar='TYPE', help='accepted Content-Types')
+    http.add_argument('--ignored-status-codes', nargs='+', type=int, metavar='CODE')
+    http.add_argument('--paths-ignored', nargs='*', metavar='PATTERN')
+    http.add_argument('--no-verify-ssl', action='store_true')
+    http.add_argument('--body-limit', type=int, default=1000000, help='bytes read per response, 0 for no limit')
+    http.add_argument('--no-sort-query', action='store_true')
+    http.add_argument('--url-cache-size', type=int, default=65536)
+    http.add_argument('--connections-limit', type=int, default=100)
+    http.add_argument('--connections-limit-per-host', type=int, default=0)
+    http.add_argument('--keepalive-timeout', type=float, default=15)
+    http.add_argument('--dns-cache-ttl', type=int, default=10)
+    http.add_argument('--rate', type=float, help='requests per second per host')
+    http.add_argument('--burst', type=int, default=1)
+    http.add_argument('--host-concurrency', type=int, default=16)
+    return parser
+
+
+def seeds_read(args):
+    seeds = list(args.seeds)
+    if args.input:
+        handle = sys.stdin if args.input == '-' else open(args.input)
+        try:
+            for line in handle:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    seeds.append(line)
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+    return seeds
+
+
+def previous_read(path):
+    from digslash import sinks
+
+    previous = dict()
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            if line.strip():
+                url, entry = sinks.deserialize(line)
+                previous[url] = entry
+    return previous
+
+
+def site_options(args):
+    options = {
+        'deduplicate': not args.no_deduplicate,
+        'workers_no': args.workers,
+        'limit': args.limit,
+        'store_content': args.store_content,
+        'store_headers': args.store_headers,
+        'store_links': args.store_links,
+        'ignored_status_codes': args.ignored_status_codes,
+        'verify_ssl': not args.no_verify_ssl,
+        'body_limit': args.body_limit,
+        'parser_backend': args.parser_backend,
+        'incremental': args.incremental,
+        'near_duplicates_distance': args.near_duplicates_distance,
+        'hash_algorithm': args.hash_algorithm,
+        'sort_query': not args.no_sort_query,
+        'url_cache_size': args.url_cache_size,
+        'seed_robots': args.seed_robots,
+        'deadline': args.deadline,
+        'drain_timeout': args.drain_timeout,
+        'compact': args.compact,
+    }
+    if args.content_types:
+        options['accepted_content_types'] = args.content_types
+    if args.paths_ignored is not None:
+        options['paths_ignored'] = args.paths_ignored
+    if args.previous:
+        options['previous'] = previous_read(args.previous)
+    if args.extractors:
+        from digslash import extractors
+        options['extractors'] = extractors.EXTRACTORS
+    if args.parse_cache:
+        from digslash import caches
+        options['parse_cache'] = caches.ParseCache(args.parse_cache, args.parse_cache_path)
+    if args.record or args.replay:
+        from digslash import replays
+        options['fetch_store'] = replays.FetchStore(args.record or args.replay, 'record' if args.record else 'replay')
+    return options
+
+
+def use_uvloop():
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+class Progress:
+
+    def __init__(self, sites, sink, interval=1.0, quiet=False):
+        self.sites = sites
+        self.sink = sink
+        self.interval = interval
+        self.quiet = quiet
+        self.started = time.monotonic()
+
+    def pages(self):
+        return sum(len(site.results) for site in self.sites)
+
+    def line(self):
+        elapsed = time.monotonic() - self.started
+        pages = self.pages()
+        queued = sum(site.queue.qsize() for site in self.sites if site.queue is not None)
+        in_flight = sum(site.in_flight for site in self.sites)
+        return '{} pages in {:.1f}s, {:.1f} pages/s, {} in flight, {} queued'.format(
+            pages, elapsed, pages / elapsed if elapsed else 0.0, in_flight, queued
+        )
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            # Readers of the stream see results while the crawl is still going
+            self.sink.flush()
+            if self.sink.broken:
+                logger.info('Output closed, draining')
+                await asyncio.gather(*(site.drain() for site in self.sites if site.queue is not None))
+                return
+            if not self.quiet:
+                sys.stderr.write('\r' + self.line() if sys.stderr.isatty() else self.line() + '\n')
+                sys.stderr.flush()
+
+    def summary(self):
+        if not self.quiet:
+            sys.stderr.write(('\r' if sys.stderr.isatty() else '') + self.line() + '\n')
+
+
+async def crawl(args, seeds, output, options):
+    from concurrent import futures
+
+    from digslash import (
+        crawlers,
+        frontiers,
+        schedulers,
+        sinks,
+        sites,
+        stats,
+    )
+
+    sink = sinks.StreamSink(output)
+    crawl_sites = list()
+    for i, seed in enumerate(seeds):
+        site_kwargs = dict(options, sinks=[sink])
+        if args.state:
+            site_kwargs['state_path'] = args.state if len(seeds) == 1 else '{}.{}'.format(args.state, i)
+        if args.max_depth is not None or args.prefix_limit is not None:
+            site_kwargs['frontier'] = frontiers.PriorityFrontier(max_depth=args.max_depth, prefix_limit=args.prefix_limit)
+        crawl_sites.append(sites.Site(seed, **site_kwargs))
+    collected = None
+    if args.stats:
+        collected = stats.Stats(args.stats, args.stats_interval, args.stats_format)
+    scheduler = None
+    if args.rate:
+        scheduler = schedulers.Scheduler(rate=args.rate, burst=args.burst, concurrency=args.host_concurrency)
+    executor = futures.ProcessPoolExecutor(args.processes) if args.processes else None
+    crawler = crawlers.Crawler(
+        crawl_sites,
+        concurrency=args.concurrency,
+        executor=executor,
+        scheduler=scheduler,
+        verify_ssl=not args.no_verify_ssl,
+        connections_limit=args.connections_limit,
+        connections_limit_per_host=args.connections_limit_per_host,
+        keepalive_timeout=args.keepalive_timeout,
+        dns_cache_ttl=args.dns_cache_ttl,
+        stats=collected,
+    )
+    loop = asyncio.get_running_loop()
+
+    def interrupt():
+        logger.warning('Interrupted, draining')
+        # A second interrupt stops right away
+        loop.remove_signal_handler(signal.SIGINT)
+        for site in crawl_sites:
+            if site.queue is not None:
+                asyncio.ensure_future(site.drain())
+
+    try:
+        loop.add_signal_handler(signal.SIGINT, interrupt)
+    except NotImplementedError:
+        pass
+    progress = Progress(crawl_sites, sink, args.progress_interval, args.quiet)
+    reporter = asyncio.create_task(progress.run())
+    try:
+        await crawler.crawl()
+    finally:
+        reporter.cancel()
+        await asyncio.gather(reporter, return_exceptions=True)
+        if executor is not None:
+            executor.shutdown()
+        if 'parse_cache' in options:
+            options['parse_cache'].close()
+        if 'fetch_store' in options:
+            options['fetch_store'].close()
+        sink.flush()
+        if sink.broken and output is sys.stdout:
+            # Keeps the interpreter from failing again on the final flush of a closed pipe
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        progress.summary()
+
+
+def main(argv=None):
+    parser = parser_create()
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        stream=sys.stderr,
+        level=(logging.WARNING, logging.INFO, logging.DEBUG)[min(args.verbose, 2)],
+        format='%(asctime)s %(levelname)s %(message)s',
+    )
+    seeds = seeds_read(args)
+    if not seeds:
+        parser.error('no URLs given, pass them as arguments or through --input')
+    if not args.no_uvloop and use_uvloop():
+        logger.debug('Using uvloop')
+    try:
+        options = site_options(args)
+    except (OSError, ValueError) as exc:
+        # Unreadable --previous snapshots or --replay stores, before the output gets truncated
+        parser.error(str(exc))
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        asyncio.run(crawl(args, seeds, output, options))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
@@ -0,0 +1,86 @@
+import asyncio
+import ssl
+
+from digslash import (
+    frontiers,
+    logger,
+    sinks,
+    sites,
+)
+
+
+class Crawler(sites.Pooled):
+
+    def __init__(self,
+        sites,
+        concurrency=64,
+        executor=None,
+        scheduler=None,
+        verify_ssl=True,
+        connections_limit=100,
+        connections_limit_per_host=0,
+        keepalive_timeout=15,
+        dns_cache_ttl=10,
+        stats=None
+    ):
+        self.sites = list(sites)
+        self.concurrency = concurrency
+        self.executor = executor
+        self.scheduler = scheduler
+        self.verify_ssl = verify_ssl
+        self.connections_limit = connections_limit
+        self.connections_limit_per_host = connections_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.stats = stats
+        self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+        self.ssl_context.check_hostname = False
+        if not verify_ssl:
+            self.ssl_context.verify_mode = ssl.CERT_NONE
+        self.session = None
+        self.connections = {
+            'created': 0,
+            'reused': 0,
+        }
+
+    @property
+    def results(self):
+        return {site.base: site.results for site in self.sites}
+
+    def handle_site_result(self, site, result):
+        if isinstance(result, Exception):
+            logger.error('Crawling {} failed: {}'.format(site.base, result))
+
+    async def crawl(self):
+        self.session = self.session_create()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        for site in self.sites:
+            site.session = self.session
+            site.semaphore = semaphore
+            if site.executor is None:
+                site.executor = self.executor
+            if site.scheduler is None:
+                site.scheduler = self.scheduler
+            if site.stats is None and self.stats is not None:
+                site.stats = self.stats
+        try:
+            results = await asyncio.gather(*(site.crawl() for site in self.sites), return_exceptions=True)
+        finally:
+            await self.session.close()
+            self.session = None
+        for site, result in zip(self.sites, results):
+            self.handle_site_result(site, result)
+
+
+def crawl_partition(base, path, partition=None, partitions=1, **options):
+    frontier = frontiers.SQLiteFrontier(path, partition, partitions)
+    checksums_index = frontiers.SQLiteChecksums(path)
+    if 'sinks' not in options:
+        options['sinks'] = [sinks.SQLiteSink(path)]
+    site = sites.Site(base, frontier=frontier, checksums_index=checksums_index, **options)
+    try:
+        asyncio.run(site.crawl())
+    finally:
+        frontier.close()
+        checksums_index.close()
+    return dict(site.results)
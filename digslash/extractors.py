@@ -0,0 +1,128 @@
+import html
+import re
+import zlib
+
+from digslash import nodes
+
+
+ELEMENTS_ATTRS = (
+    ('a', 'href'),
+    ('area', 'href'),
+    ('link', 'href'),
+    ('script', 'src'),
+    ('iframe', 'src'),
+    ('frame', 'src'),
+    ('form', 'action'),
+    ('button', 'formaction'),
+    ('input', 'formaction'),
+    ('img', 'src'),
+    ('img', 'srcset'),
+    ('source', 'src'),
+    ('source', 'srcset'),
+    ('video', 'src'),
+    ('video', 'poster'),
+    ('audio', 'src'),
+    ('embed', 'src'),
+    ('object', 'data'),
+)
+
+SCRIPT_URL_RE = re.compile(r'''["'`]((?:https?:)?//[^"'`\s<>\\]+|/[^"'`\s<>\\/][^"'`\s<>\\]*|\.{1,2}/[^"'`\s<>\\]+)["'`]''')
+
+REFRESH_URL_RE = re.compile(r'url\s*=\s*["\']?([^"\';]+)', re.IGNORECASE)
+
+SITEMAP_LOC_RE = re.compile(r'<loc>\s*([^<\s]+)\s*</loc>', re.IGNORECASE)
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class HTMLExtractor(nodes.LinkParser):
+
+    def __init__(self, elements_attrs=ELEMENTS_ATTRS):
+        super().__init__(elements_attrs)
+        self.script = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'meta':
+            attrs = dict(attrs)
+            if (attrs.get('http-equiv') or '').lower() == 'refresh':
+                match = REFRESH_URL_RE.search(attrs.get('content') or '')
+                if match:
+                    self.hits.append((tag, 'content', match.group(1).strip()))
+            return
+        if tag == 'script':
+            self.script = list()
+        super().handle_starttag(tag, attrs)
+
+    def handle_data(self, data):
+        if self.script is not None:
+            self.script.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'script' and self.script is not None:
+            for link in script_links(''.join(self.script)):
+                self.hits.append((tag, None, link))
+            self.script = None
+
+    def links(self):
+        for elem, attr, value in self.hits:
+            if attr == 'srcset':
+                for candidate in value.split(','):
+                    candidate = candidate.strip()
+                    if candidate:
+                        yield candidate.split()[0]
+            else:
+                yield value
+
+
+def script_links(text):
+    # JSON commonly escapes forward slashes
+    return SCRIPT_URL_RE.findall(text.replace('\\/', '/'))
+
+
+def extract_html(node):
+    parser = HTMLExtractor()
+    parser.feed(node.content)
+    parser.close()
+    return parser.links()
+
+
+def extract_script(node):
+    return script_links(node.content)
+
+
+def extract_sitemap(node):
+    content = node.content
+    if node.body.startswith(GZIP_MAGIC):
+        # The body may be cut at body_limit, a decompression object keeps whatever is readable
+        try:
+            content = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(node.body).decode('utf-8', 'replace')
+        except zlib.error:
+            return list()
+    return [html.unescape(loc) for loc in SITEMAP_LOC_RE.findall(content)]
+
+
+def extract_robots(text):
+    links = list()
+    for line in text.splitlines():
+        field, sep, value = line.partition('#')[0].partition(':')
+        field, value = field.strip().lower(), value.strip()
+        if not sep or not value:
+            continue
+        if field == 'sitemap':
+            links.append(value)
+        elif field in ('allow', 'disallow') and '*' not in value and '$' not in value:
+            links.append(value)
+    return links
+
+
+EXTRACTORS = {
+    'text/html': extract_html,
+    'application/xhtml+xml': extract_html,
+    'text/javascript': extract_script,
+    'application/javascript': extract_script,
+    'application/json': extract_script,
+    'text/xml': extract_sitemap,
+    'application/xml': extract_sitemap,
+    'application/gzip': extract_sitemap,
+    'application/x-gzip': extract_sitemap,
+}
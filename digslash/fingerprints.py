@@ -0,0 +1,83 @@
+import hashlib
+import html
+import re
+
+
+TOKEN_RE = re.compile(r'\w+')
+
+HIDDEN_RE = re.compile(r'<(script|style)\b.*?</\1\s*>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+
+TAG_RE = re.compile(r'<[^>]*>')
+
+
+def visible_text(content):
+    # Markup shared by every page of a template must not make their texts look alike
+    return html.unescape(TAG_RE.sub(' ', HIDDEN_RE.sub(' ', content)))
+
+
+def shingles(text, size=3):
+    tokens = TOKEN_RE.findall(text.lower())
+    if len(tokens) < size:
+        return set([' '.join(tokens)])
+    return set(' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1))
+
+
+def simhash(features, bits=64):
+    size = bits // 8
+    blake2b = hashlib.blake2b
+    total = 0
+    # Bit-sliced counters: planes[i] holds bit i of the count of features with each bit set, adding
+    # a feature ripples a carry through the planes instead of touching all the bits one by one
+    planes = list()
+    for feature in features:
+        carry = int.from_bytes(blake2b(feature.encode('utf-8', 'replace'), digest_size=size).digest(), 'big')
+        total += 1
+        for i, plane in enumerate(planes):
+            planes[i] = plane ^ carry
+            carry &= plane
+            if not carry:
+                break
+        else:
+            planes.append(carry)
+    fingerprint = 0
+    for bit in range(bits):
+        count = 0
+        for i, plane in enumerate(planes):
+            count |= (plane >> bit & 1) << i
+        # A bit is set when more features have it set than not
+        if 2 * count > total:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def distance(first, second):
+    return bin(first ^ second).count('1')
+
+
+class SimHashIndex:
+
+    def __init__(self, distance=3, bits=64):
+        # Pigeonhole principle: fingerprints within the distance share at least one whole block
+        self.distance = distance
+        self.bits = bits
+        self.blocks = distance + 1
+        self.block_bits = -(-bits // self.blocks)
+        self.block_mask = (1 << self.block_bits) - 1
+        self.tables = [dict() for _ in range(self.blocks)]
+
+    def keys(self, fingerprint):
+        for block in range(self.blocks):
+            yield block, fingerprint >> (block * self.block_bits) & self.block_mask
+
+    def lookup(self, fingerprint):
+        for block, key in self.keys(fingerprint):
+            for candidate, value in self.tables[block].get(key, ()):
+                if distance(candidate, fingerprint) <= self.distance:
+                    return value
+
+    def add(self, fingerprint, value):
+        for block, key in self.keys(fingerprint):
+            self.tables[block].setdefault(key, list()).append((fingerprint, value))
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.tables[0].values())
@@ -0,0 +1,360 @@
+import array
+import asyncio
+import collections
+import heapq
+import itertools
+import posixpath
+import sqlite3
+import time
+import urllib.parse
+import uuid
+import zlib
+from concurrent import futures
+
+
+class Frontier(asyncio.Queue):
+
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self.seen = set()
+
+    def _put(self, item):
+        super()._put(item)
+        self.seen.add(item[0])
+
+    def __contains__(self, url):
+        return url in self.seen
+
+    def __len__(self):
+        return len(self.seen)
+
+    def done(self, url):
+        self.task_done()
+
+    def retry(self, url, source):
+        self.put_nowait((url, source))
+        self.task_done()
+
+    def release(self, url):
+        # Handed back by a cancelled worker, nothing waits on this frontier any more
+        pass
+
+    def drop(self, url):
+        self.task_done()
+
+    def flush(self):
+        for _ in range(self.qsize()):
+            self.get_nowait()
+            self.task_done()
+
+
+class Seen:
+
+    def __init__(self, table):
+        self.table = table
+        # One byte per URL ID
+        self.flags = bytearray()
+        self.size = 0
+
+    def mark(self, uid):
+        if uid >= len(self.flags):
+            self.flags.extend(bytes(uid + 1 - len(self.flags)))
+        if not self.flags[uid]:
+            self.flags[uid] = 1
+            self.size += 1
+
+    def add(self, url):
+        self.mark(self.table.id(url))
+
+    def __contains__(self, url):
+        uid = self.table.get(url)
+        return uid is not None and uid < len(self.flags) and self.flags[uid] == 1
+
+    def __len__(self):
+        return self.size
+
+
+class CompactFrontier(Frontier):
+
+    def __init__(self, table, maxsize=0):
+        self.table = table
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        # The queue holds URL IDs only, the source of each URL lives in a parallel array
+        self._queue = collections.deque()
+        self.seen = Seen(self.table)
+        self.sources = array.array('i')
+
+    def _put(self, item):
+        url, source = item
+        uid = self.table.id(url)
+        self.seen.mark(uid)
+        if uid >= len(self.sources):
+            self.sources.extend([-1] * (uid + 1 - len(self.sources)))
+        self.sources[uid] = self.table.id(source) if source else -1
+        self._queue.append(uid)
+
+    def _get(self):
+        uid = self._queue.popleft()
+        source = self.sources[uid]
+        return self.table[uid], self.table[source] if source >= 0 else ''
+
+
+ASSET_EXTENSIONS = frozenset((
+    '.css', '.js', '.json', '.xml', '.txt', '.ico', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp',
+    '.woff', '.woff2', '.ttf', '.eot', '.mp3', '.mp4', '.webm', '.pdf', '.zip', '.gz',
+))
+
+
+def path_prefix(url, segments=1):
+    path = urllib.parse.urlsplit(url).path
+    return '/'.join(path.split('/')[:segments + 1])
+
+
+def breadth_first(frontier, url, depth):
+    return depth
+
+
+def novelty(frontier, url, depth):
+    # Within a level, URLs under rarely seen path prefixes go first
+    return depth, frontier.prefixes.get(path_prefix(url, frontier.prefix_segments), 0)
+
+
+def pages_first(frontier, url, depth):
+    extension = posixpath.splitext(urllib.parse.urlsplit(url).path)[1].lower()
+    return depth, extension in ASSET_EXTENSIONS
+
+
+class PriorityFrontier(Frontier):
+
+    def __init__(self, score=breadth_first, max_depth=None, prefix_limit=None, prefix_segments=1, maxsize=0):
+        self.score = score
+        self.max_depth = max_depth
+        self.prefix_limit = prefix_limit
+        self.prefix_segments = prefix_segments
+        self.depths = dict()
+        self.prefixes = dict()
+        self.dropped = 0
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self._queue = list()
+        self.counter = itertools.count()
+
+    def _put(self, item):
+        url, source = item
+        heapq.heappush(self._queue, (self.score(self, url, self.depths[url]), next(self.counter), url, source))
+        self.seen.add(url)
+
+    def _get(self):
+        return heapq.heappop(self._queue)[2:]
+
+    def depth(self, url):
+        return self.depths.get(url, 0)
+
+    def admit(self, url, source):
+        depth = self.depths[source] + 1 if source in self.depths else 0
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        prefix = path_prefix(url, self.prefix_segments)
+        count = self.prefixes.get(prefix, 0)
+        if self.prefix_limit is not None and count >= self.prefix_limit:
+            return False
+        self.prefixes[prefix] = count + 1
+        self.depths[url] = depth
+        return True
+
+    def put_nowait(self, item):
+        url, source = item
+        # Retried URLs were admitted already and keep their depth
+        if url not in self.seen and not self.admit(url, source):
+            self.dropped += 1
+            return
+        super().put_nowait(item)
+
+
+# Processes sharing the database file on one machine claim URLs from it. SQLite in WAL mode needs
+# shared memory, so the file must not live on a network filesystem.
+class SQLiteFrontier:
+
+    QUEUED = 0
+    CLAIMED = 1
+    DONE = 2
+    DROPPED = 3
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS frontier ('
+        'url TEXT PRIMARY KEY, source TEXT, partition INTEGER, status INTEGER DEFAULT 0, owner TEXT, claimed REAL)',
+        'CREATE INDEX IF NOT EXISTS frontier_status ON frontier (partition, status)',
+    )
+
+    def __init__(self, path, partition=None, partitions=1, poll_interval=0.05, lease=60, owner=None):
+        self.path = path
+        self.partition = partition
+        self.partitions = partitions
+        self.poll_interval = poll_interval
+        # Claims are renewed while their owner is alive, those of a crashed process go back to the queue
+        self.lease = lease
+        self.owner = owner or uuid.uuid4().hex
+        self.renewed = 0.0
+        self.seen = set()
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        for statement in self.SCHEMA:
+            self.connection.execute(statement)
+        columns = {row[1] for row in self.connection.execute('PRAGMA table_info(frontier)')}
+        for column, kind in (('owner', 'TEXT'), ('claimed', 'REAL')):
+            if column not in columns:
+                self.connection.execute('ALTER TABLE frontier ADD COLUMN {} {}'.format(column, kind))
+        # Claims wait on the database lock, they run on their own connection and thread, off the event loop
+        self.claimer = futures.ThreadPoolExecutor(max_workers=1)
+        self.claim_connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+
+    def partition_of(self, url):
+        return zlib.crc32(url.encode('utf-8', 'surrogatepass')) % self.partitions
+
+    def partition_filter(self):
+        if self.partition is None:
+            return '', tuple()
+        return ' AND partition = ?', (self.partition,)
+
+    def __contains__(self, url):
+        if url in self.seen:
+            return True
+        if self.connection.execute('SELECT 1 FROM frontier WHERE url = ?', (url,)).fetchone():
+            self.seen.add(url)
+            return True
+        return False
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM frontier').fetchone()[0]
+
+    def put_nowait(self, item):
+        url, source = item
+        self.connection.execute(
+            'INSERT OR IGNORE INTO frontier (url, source, partition) VALUES (?, ?, ?)',
+            (url, source, self.partition_of(url))
+        )
+        self.seen.add(url)
+
+    def claim(self):
+        condition, params = self.partition_filter()
+        now = time.time()
+        self.claim_connection.execute('BEGIN IMMEDIATE')
+        try:
+            self.claim_connection.execute(
+                'UPDATE frontier SET status = ?, owner = NULL WHERE status = ? AND claimed < ?',
+                (self.QUEUED, self.CLAIMED, now - self.lease)
+            )
+            row = self.claim_connection.execute(
+                'SELECT rowid, url, source FROM frontier WHERE status = ?' + condition + ' ORDER BY rowid LIMIT 1',
+                (self.QUEUED,) + params
+            ).fetchone()
+            if row is not None:
+                self.claim_connection.execute(
+                    'UPDATE frontier SET status = ?, owner = ?, claimed = ? WHERE rowid = ?',
+                    (self.CLAIMED, self.owner, now, row[0])
+                )
+        finally:
+            self.claim_connection.execute('COMMIT')
+        if row is not None:
+            return row[1], row[2]
+
+    def renew(self):
+        self.claim_connection.execute(
+            'UPDATE frontier SET claimed = ? WHERE status = ? AND owner = ?', (time.time(), self.CLAIMED, self.owner)
+        )
+
+    async def get(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await loop.run_in_executor(self.claimer, self.claim)
+            if item is not None:
+                return item
+            await asyncio.sleep(self.poll_interval)
+
+    def get_nowait(self):
+        item = self.claimer.submit(self.claim).result()
+        if item is None:
+            raise asyncio.QueueEmpty
+        return item
+
+    def done(self, url):
+        self.connection.execute('UPDATE frontier SET status = ? WHERE url = ?', (self.DONE, url))
+
+    def retry(self, url, source):
+        self.connection.execute('UPDATE frontier SET status = ? WHERE url = ?', (self.QUEUED, url))
+
+    def release(self, url):
+        # The claim goes back to the queue right away instead of waiting for the lease to expire
+        self.connection.execute(
+            'UPDATE frontier SET status = ?, owner = NULL WHERE url = ? AND status = ? AND owner = ?',
+            (self.QUEUED, url, self.CLAIMED, self.owner)
+        )
+
+    def drop(self, url):
+        self.connection.execute('UPDATE frontier SET status = ? WHERE url = ?', (self.DROPPED, url))
+
+    def flush(self):
+        condition, params = self.partition_filter()
+        self.connection.execute(
+            'UPDATE frontier SET status = ? WHERE status = ?' + condition, (self.DROPPED, self.QUEUED) + params
+        )
+
+    def qsize(self):
+        condition, params = self.partition_filter()
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM frontier WHERE status = ?' + condition, (self.QUEUED,) + params
+        ).fetchone()[0]
+
+    def empty(self):
+        # The crawl is over only once no partition has queued or in-flight URLs left
+        return self.connection.execute(
+            'SELECT 1 FROM frontier WHERE status IN (?, ?) LIMIT 1', (self.QUEUED, self.CLAIMED)
+        ).fetchone() is None
+
+    async def join(self):
+        loop = asyncio.get_running_loop()
+        while not self.empty():
+            if time.monotonic() - self.renewed > self.lease / 3:
+                await loop.run_in_executor(self.claimer, self.renew)
+                self.renewed = time.monotonic()
+            await asyncio.sleep(self.poll_interval)
+
+    def close(self):
+        self.claimer.shutdown()
+        self.claim_connection.close()
+        self.connection.close()
+
+
+class SQLiteChecksums:
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS checksums (checksum TEXT PRIMARY KEY, url TEXT)')
+
+    def __contains__(self, checksum):
+        return self.connection.execute('SELECT 1 FROM checksums WHERE checksum = ?', (checksum,)).fetchone() is not None
+
+    def __getitem__(self, checksum):
+        row = self.connection.execute('SELECT url FROM checksums WHERE checksum = ?', (checksum,)).fetchone()
+        if row is None:
+            raise KeyError(checksum)
+        return row[0]
+
+    def __setitem__(self, checksum, url):
+        self.connection.execute('INSERT OR REPLACE INTO checksums VALUES (?, ?)', (checksum, url))
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM checksums').fetchone()[0]
+
+    def setdefault(self, checksum, url):
+        self.connection.execute('INSERT OR IGNORE INTO checksums VALUES (?, ?)', (checksum, url))
+        return self[checksum]
+
+    def close(self):
+        self.connection.close()
@@ -1,9 +1,93 @@
+import codecs
 import hashlib
+import html.parser
+import re
+import time
 import urllib.parse
 
-import bs4
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 
-from digslash import logger
+from digslash import fingerprints
+
+
+HASH_ALGORITHMS = {
+    'md5': hashlib.md5,
+    'sha1': hashlib.sha1,
+    'blake2b': lambda: hashlib.blake2b(digest_size=16),
+}
+if xxhash is not None:
+    HASH_ALGORITHMS['xxh3'] = xxhash.xxh3_128
+
+
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_:.+-]+)', re.IGNORECASE)
+
+# Only the head of the document is searched for a <meta> declaration
+SNIFF_LIMIT = 1024
+
+# What browsers assume for undeclared legacy content
+FALLBACK_ENCODING = 'windows-1252'
+
+
+def is_encoding(name):
+    try:
+        codecs.lookup(name)
+    except LookupError:
+        return False
+    return True
+
+
+def sniff(content, declared=None, complete=True):
+    for bom, encoding in BOMS:
+        if content.startswith(bom):
+            return encoding
+    if declared and is_encoding(declared):
+        return declared.lower()
+    match = META_CHARSET_RE.search(content, 0, SNIFF_LIMIT)
+    if match:
+        encoding = match.group(1).decode('ascii').lower()
+        if is_encoding(encoding):
+            return encoding
+    if not complete:
+        return None
+    if content.isascii():
+        return 'ascii'
+    try:
+        content.decode('utf-8')
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+    return 'utf-8'
+
+
+class LinkParser(html.parser.HTMLParser):
+
+    def __init__(self, elements_attrs):
+        super().__init__()
+        self.followed = dict()
+        for elem, attr in elements_attrs:
+            self.followed.setdefault(elem, list()).append(attr)
+        self.hits = list()
+
+    def handle_starttag(self, tag, attrs):
+        try:
+            followed = self.followed[tag]
+        except KeyError:
+            return
+        attrs = dict(attrs)
+        for attr in followed:
+            if attr in attrs:
+                # Bare attributes come back as None, BeautifulSoup reports them as empty strings
+                self.hits.append((tag, attr, attrs[attr] or ''))
 
 
 class Node:
@@ -15,70 +99,173 @@ class Node:
         ('form', 'action'),
     )
 
-    def __init__(self, site, content, encoding='ascii', current=None):
+    PARSER_BACKENDS = (
+        'bs4',
+        'html',
+    )
+
+    def __init__(self, site, content, encoding=None, current=None, content_type=None, links=None, checksum=None):
         self.site = site
-        self.encoding = encoding
+        self.body = content
+        self.content_type = content_type
+        # Links extracted earlier from a byte-identical body, parsing is skipped when given
+        self.extracted = links
         self.results = set()
-        self._checksum = None
+        self._checksum = checksum
+        self._content = None
+        self.timings = dict() if site.instrumented else None
         if current:
             self.current = urllib.parse.urlsplit(current)
         else:
             self.current = self.site.urlsplit
-        try:
-            self.content = content.decode(self.encoding)
-        except Exception as exc:
-            logger.debug(f'Cannot decode due {current} to {exc}')
-            self.content = None
+        if content is None:
+            # Incremental mode, the body arrives in chunks through feed()
+            self.encoding = encoding
+            self.parser = LinkParser(self.FOLLOWED_ELEMENTS_ATTRS)
+            self.decoder = None
+            self.ascii = True
+            self.hasher = HASH_ALGORITHMS[self.site.hash_algorithm]()
+            self.hits_seen = 0
+            # Kept for the SimHash only, the text is not needed otherwise
+            self.texts = list() if self.site.near_duplicates_distance is not None else None
+            return
+        self.encoding = sniff(content, encoding)
+        self.extractor = self.site.extractors.get(content_type) if self.site.extractors else None
+        self.parser = None
+
+    def parser_create(self):
+        started = time.perf_counter()
+        if self.site.parser_backend == 'bs4':
+            # Imported on first use, crawls on the html backend never pay for it
+            import bs4
+            # The encoding is already known, BeautifulSoup does not have to detect it again
+            self.parser = bs4.BeautifulSoup(self.body, 'html.parser', from_encoding=self.encoding if self.body else None)
         else:
-            self.parser = bs4.BeautifulSoup(content, 'html.parser')
+            self.parser = LinkParser(self.FOLLOWED_ELEMENTS_ATTRS)
+        if self.timings is not None:
+            self.timings['parse'] = time.perf_counter() - started
+
+    @property
+    def content(self):
+        if self._content is None and self.body is not None:
+            self._content = self.body.decode(self.encoding, 'replace')
+        return self._content
 
     def extract_links(self):
-        for elem, attr in self.FOLLOWED_ELEMENTS_ATTRS:
-            for ele in self.parser.find_all(elem):
-                try:
-                    self.results.add(ele[attr])
-                except KeyError:
-                    pass
-
-    def links_filter(self):
-        refined = set()
-        for link in self.results:
-            url = urllib.parse.urlparse(link)
-            discard = False
-            if url.scheme not in ['http', 'https'] and url.scheme != '':
-                discard = True
-            for sep in self.site.paths_ignored:
-                if sep in url.path or (not url.netloc and sep in link):
-                    discard = True
-                    break
-            if not discard and (url.netloc == self.current.netloc or not url.netloc):
-                refined.add(link)
-        self.results = refined
-
-    def links_rebase(self):
+        if self.extracted is not None:
+            self.results.update(self.extracted)
+            return
+        if self.extractor is not None:
+            self.results.update(self.extractor(self))
+            return
+        self.parser_create()
+        if isinstance(self.parser, LinkParser):
+            self.parser.feed(self.content)
+            self.parser.close()
+            for elem, attr, value in self.parser.hits:
+                self.results.add(value)
+        else:
+            for elem, attr in self.FOLLOWED_ELEMENTS_ATTRS:
+                for ele in self.parser.find_all(elem):
+                    try:
+                        self.results.add(ele[attr])
+                    except KeyError:
+                        pass
+
+    def links_resolve(self, links):
         refined = set()
-        for link in self.results:
-            split_url = urllib.parse.urlsplit(link)
-            rebased_url = urllib.parse.urljoin(
-                self.site.base, urllib.parse.SplitResult('', '', split_url.path, split_url.query, split_url.fragment).geturl()
-            )
-            refined.add(rebased_url)
-        self.results = refined
+        for link in links:
+            url = self.site.urls.resolve(link, self.current)
+            if url is not None:
+                refined.add(url)
+        return refined
 
     @property
     def checksum(self):
         if self._checksum is None:
-            self._checksum = hashlib.md5(self.content.encode(self.encoding)).hexdigest()
+            self._checksum = checksum(self.body, self.site.hash_algorithm)
         return self._checksum
 
     def process(self):
-        if self.content is None:
+        if self.body is None:
             return
-        self.extract_links()
-        self.links_filter()
-        self.links_rebase()
-        return {
+        cached = self.extracted is not None
+        if self.timings is None:
+            self.extract_links()
+            extracted = self.results
+            self.results = self.links_resolve(extracted)
+        else:
+            started = time.perf_counter()
+            self.extract_links()
+            resolving = time.perf_counter()
+            extracted = self.results
+            self.results = self.links_resolve(extracted)
+            self.timings['extract'] = resolving - started - self.timings.get('parse', 0.0)
+            # The resolver filters and rebases in a single pass
+            self.timings['resolve'] = time.perf_counter() - resolving
+        results = {
+            'encoding': self.encoding,
+            'checksum': self.checksum,
+            'links': self.results,
+        }
+        if self.site.near_duplicates_distance is not None:
+            results['simhash'] = fingerprints.simhash(fingerprints.shingles(fingerprints.visible_text(self.content)))
+        if self.site.cache_parses and not cached:
+            # Raw links, rebased again for every page that shares the body
+            results['extracted'] = tuple(extracted)
+        if self.timings is not None:
+            results['timings'] = self.timings
+        return results
+
+    def feed(self, chunk, final=False, declared=None):
+        if self.decoder is None:
+            self.encoding = sniff(chunk, declared or self.encoding, complete=False)
+            # Undeclared bodies are taken as UTF-8 until a byte proves otherwise, as sniff() does
+            self.decoder = codecs.getincrementaldecoder(self.encoding or 'utf-8')('replace' if self.encoding else 'strict')
+        self.ascii = self.ascii and chunk.isascii()
+        self.hasher.update(chunk)
+        if self.encoding is None:
+            pending = self.decoder.getstate()[0]
+            try:
+                text = self.decoder.decode(chunk, final)
+            except UnicodeDecodeError:
+                self.encoding = FALLBACK_ENCODING
+                self.decoder = codecs.getincrementaldecoder(FALLBACK_ENCODING)('replace')
+                text = self.decoder.decode(pending + chunk, final)
+        else:
+            text = self.decoder.decode(chunk, final)
+        if self.texts is not None:
+            self.texts.append(text)
+        self.parser.feed(text)
+        if final:
+            self.parser.close()
+        links = set(value for elem, attr, value in self.parser.hits[self.hits_seen:])
+        self.hits_seen = len(self.parser.hits)
+        links = self.links_resolve(links) - self.results
+        self.results.update(links)
+        return links
+
+    def close(self):
+        self.feed(b'', final=True)
+        if self.encoding is None:
+            self.encoding = 'ascii' if self.ascii else 'utf-8'
+        self._checksum = self.hasher.hexdigest()
+        results = {
             'encoding': self.encoding,
             'checksum': self.checksum,
             'links': self.results,
         }
+        if self.site.near_duplicates_distance is not None:
+            text = fingerprints.visible_text(''.join(self.texts))
+            results['simhash'] = fingerprints.simhash(fingerprints.shingles(text))
+        return results
+
+
+def process(site, content, encoding=None, current=None, content_type=None, links=None, checksum=None):
+    return Node(site, content, encoding, current, content_type, links, checksum).process()
+
+
+def checksum(content, algorithm='md5'):
+    hasher = HASH_ALGORITHMS[algorithm]()
+    hasher.update(content)
+    return hasher.hexdigest()
@@ -0,0 +1,194 @@
+import array
+import collections.abc
+import sys
+
+
+class URLTable:
+
+    def __init__(self):
+        self.ids = dict()
+        self.urls = list()
+
+    def id(self, url):
+        uid = self.ids.get(url)
+        if uid is None:
+            uid = len(self.urls)
+            self.ids[url] = uid
+            self.urls.append(url)
+        return uid
+
+    def get(self, url):
+        return self.ids.get(url)
+
+    def __getitem__(self, uid):
+        return self.urls[uid]
+
+    def __contains__(self, url):
+        return url in self.ids
+
+    def __len__(self):
+        return len(self.urls)
+
+
+class Entry:
+
+    __slots__ = (
+        'source',
+        'encoding',
+        'near_duplicate_of',
+        'extra',
+    )
+
+
+class Results(collections.abc.MutableMapping):
+
+    FIELDS = (
+        'source',
+        'encoding',
+        'checksum',
+        'near_duplicate_of',
+    )
+
+    def __init__(self, table, digest_size=16):
+        self.table = table
+        self.digest_size = digest_size
+        # Both indexed by URL ID, entries hold None where the URL has no result
+        self.entries = list()
+        self.digests = bytearray()
+        self.size = 0
+
+    def record(self, url):
+        uid = self.table.get(url)
+        if uid is None or uid >= len(self.entries) or self.entries[uid] is None:
+            raise KeyError(url)
+        return uid, self.entries[uid]
+
+    def __setitem__(self, url, entry):
+        uid = self.table.id(url)
+        record = Entry()
+        record.source = self.table.id(entry['source']) if entry.get('source') else -1
+        encoding = entry.get('encoding')
+        record.encoding = sys.intern(encoding) if isinstance(encoding, str) else encoding
+        original = entry.get('near_duplicate_of')
+        record.near_duplicate_of = self.table.id(original) if original else -1
+        extra = {key: value for key, value in entry.items() if key not in self.FIELDS}
+        if uid >= len(self.entries):
+            self.entries.extend([None] * (uid + 1 - len(self.entries)))
+            self.digests.extend(bytes(len(self.entries) * self.digest_size - len(self.digests)))
+        checksum = entry.get('checksum')
+        digest = bytes.fromhex(checksum) if checksum else b''
+        if len(digest) == self.digest_size:
+            self.digests[uid * self.digest_size:(uid + 1) * self.digest_size] = digest
+        else:
+            # Missing or foreign checksums are kept as they are
+            extra['checksum'] = checksum
+        record.extra = extra or None
+        if self.entries[uid] is None:
+            self.size += 1
+        self.entries[uid] = record
+
+    def __getitem__(self, url):
+        uid, record = self.record(url)
+        entry = {
+            'source': self.table[record.source] if record.source >= 0 else '',
+            'encoding': record.encoding,
+            'checksum': self.digests[uid * self.digest_size:(uid + 1) * self.digest_size].hex(),
+        }
+        if record.near_duplicate_of >= 0:
+            entry['near_duplicate_of'] = self.table[record.near_duplicate_of]
+        if record.extra:
+            entry.update(record.extra)
+        return entry
+
+    def __delitem__(self, url):
+        uid, record = self.record(url)
+        self.entries[uid] = None
+        self.size -= 1
+
+    def __contains__(self, url):
+        try:
+            self.record(url)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        for uid, record in enumerate(self.entries):
+            if record is not None:
+                yield self.table[uid]
+
+    def __len__(self):
+        return self.size
+
+
+class DigestIndex:
+
+    EMPTY = -1
+
+    def __init__(self, table, digest_size=16, capacity=1024):
+        self.table = table
+        self.digest_size = digest_size
+        self.size = 0
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        # Open addressing over one flat buffer of raw digests plus a parallel array of URL IDs
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.digests = bytearray(capacity * self.digest_size)
+        self.ids = array.array('i', [self.EMPTY]) * capacity
+
+    def digest(self, checksum):
+        digest = bytes.fromhex(checksum)
+        if len(digest) != self.digest_size:
+            raise ValueError('Expected a {} byte digest, got {}'.format(self.digest_size, checksum))
+        return digest
+
+    def slot(self, digest):
+        size = self.digest_size
+        # Digests are uniformly distributed already, their leading bytes make a good hash
+        i = int.from_bytes(digest[:8], 'little') & self.mask
+        while self.ids[i] != self.EMPTY and self.digests[i * size:(i + 1) * size] != digest:
+            i = (i + 1) & self.mask
+        return i
+
+    def insert(self, digest, uid):
+        i = self.slot(digest)
+        if self.ids[i] == self.EMPTY:
+            self.size += 1
+            self.digests[i * self.digest_size:(i + 1) * self.digest_size] = digest
+        self.ids[i] = uid
+        if self.size * 3 > self.capacity * 2:
+            self.resize()
+
+    def resize(self):
+        size = self.digest_size
+        digests, ids = self.digests, self.ids
+        self.allocate(self.capacity * 2)
+        self.size = 0
+        for i, uid in enumerate(ids):
+            if uid != self.EMPTY:
+                self.insert(bytes(digests[i * size:(i + 1) * size]), uid)
+
+    def __contains__(self, checksum):
+        return self.ids[self.slot(self.digest(checksum))] != self.EMPTY
+
+    def __getitem__(self, checksum):
+        uid = self.ids[self.slot(self.digest(checksum))]
+        if uid == self.EMPTY:
+            raise KeyError(checksum)
+        return self.table[uid]
+
+    def __setitem__(self, checksum, url):
+        self.insert(self.digest(checksum), self.table.id(url))
+
+    def __len__(self):
+        return self.size
+
+    def setdefault(self, checksum, url):
+        digest = self.digest(checksum)
+        uid = self.ids[self.slot(digest)]
+        if uid == self.EMPTY:
+            self.insert(digest, self.table.id(url))
+            return url
+        return self.table[uid]
@@ -0,0 +1,143 @@
+import json
+import mmap
+import os
+
+
+class Response:
+
+    __slots__ = (
+        'url',
+        'status',
+        'content_type',
+        'charset',
+        'headers',
+        'body',
+    )
+
+    def __init__(self, url, status, content_type, charset, headers, body):
+        self.url = url
+        self.status = status
+        self.content_type = content_type
+        self.charset = charset
+        self.headers = headers
+        self.body = body
+
+
+# Append-only: every record is a JSON header line, the raw body and a newline. The index next to it
+# maps URLs to header offsets, the latest record of a URL wins.
+class FetchStore:
+
+    MODES = (
+        'record',
+        'replay',
+    )
+
+    def __init__(self, path, mode='replay'):
+        if mode not in self.MODES:
+            raise ValueError('Unknown fetch store mode {}'.format(mode))
+        self.path = path
+        self.index_path = path + '.idx'
+        self.mode = mode
+        self.offsets = dict()
+        self.data = None
+        self.index = None
+        self.mapped = None
+        if mode == 'record':
+            self.data = open(path, 'ab')
+            self.index = open(self.index_path, 'a', encoding='utf-8')
+            # A scan drops any record cut short by an interrupted run before appending after it
+            self.reindex()
+        else:
+            if not os.path.exists(path):
+                raise FileNotFoundError('No fetch store to replay at {}'.format(path))
+            self.load_index()
+            with open(path, 'rb') as fil:
+                if os.fstat(fil.fileno()).st_size:
+                    # The mapping stays valid once the file is closed
+                    self.mapped = mmap.mmap(fil.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def load_index(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        try:
+            with open(self.index_path, encoding='utf-8') as fil:
+                for line in fil:
+                    url, offset = json.loads(line)
+                    self.offsets[url] = offset
+        except (FileNotFoundError, ValueError):
+            self.offsets.clear()
+            self.reindex()
+            return
+        if bool(self.offsets) != bool(size) or (self.offsets and max(self.offsets.values()) >= size):
+            # The index does not match the data file, trust the data only
+            self.offsets.clear()
+            self.reindex()
+
+    def reindex(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as fil:
+            offset = 0
+            while True:
+                line = fil.readline()
+                if not line.endswith(b'\n'):
+                    break
+                header = json.loads(line)
+                length = max(header['length'], 0)
+                body = fil.read(length + 1)
+                if len(body) != length + 1:
+                    # A record cut short by an interrupted run
+                    break
+                self.offsets[header['url']] = offset
+                offset += len(line) + length + 1
+        if self.mode == 'record':
+            self.data.truncate(offset)
+            self.data.seek(0, os.SEEK_END)
+            self.index.truncate(0)
+            for url, offset in self.offsets.items():
+                self.index.write(json.dumps([url, offset]) + '\n')
+
+    def record(self, url, status, content_type, charset, headers, body=None):
+        header = {
+            'url': url,
+            'status': status,
+            'content_type': content_type,
+            'charset': charset,
+            'headers': headers,
+            'length': -1 if body is None else len(body),
+        }
+        offset = self.data.tell()
+        self.data.write(json.dumps(header).encode('utf-8') + b'\n')
+        if body is not None:
+            self.data.write(body)
+        self.data.write(b'\n')
+        self.index.write(json.dumps([url, offset]) + '\n')
+        self.offsets[url] = offset
+
+    def get(self, url):
+        offset = self.offsets.get(url)
+        if offset is None or self.mapped is None:
+            return None
+        end = self.mapped.find(b'\n', offset)
+        header = json.loads(self.mapped[offset:end])
+        length = header['length']
+        body = None if length < 0 else self.mapped[end + 1:end + 1 + length]
+        return Response(url, header['status'], header['content_type'], header['charset'], header['headers'], body)
+
+    def __contains__(self, url):
+        return url in self.offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def flush(self):
+        if self.mode == 'record':
+            self.data.flush()
+            self.index.flush()
+
+    def close(self):
+        if self.mode == 'record':
+            self.data.close()
+            self.index.close()
+        elif self.mapped is not None:
+            self.mapped.close()
+            self.mapped = None
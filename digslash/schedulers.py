@@ -0,0 +1,126 @@
+import asyncio
+import email.utils
+import time
+import urllib.parse
+
+from digslash import logger
+
+
+class Host:
+
+    def __init__(self, name, rate, burst, concurrency):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.concurrency = concurrency
+        self.active = 0
+        self.failures = 0
+        self.blocked_until = 0.0
+        self.condition = asyncio.Condition()
+
+    def refill(self, now):
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.active >= int(self.concurrency):
+            # Woken up by release()
+            return None
+        if self.rate and self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        return 0
+
+
+class Scheduler:
+
+    RETRY_STATUS_CODES = (
+        429,
+        503,
+    )
+
+    def __init__(self,
+        rate=None,
+        burst=1,
+        concurrency=16,
+        min_concurrency=1,
+        latency_target=2.0,
+        increase=1.0,
+        decrease=0.5,
+        backoff=1.0,
+        backoff_max=60.0,
+        max_retries=3
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.min_concurrency = min_concurrency
+        self.latency_target = latency_target
+        self.increase = increase
+        self.decrease = decrease
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.max_retries = max_retries
+        self.hosts = dict()
+
+    def host(self, url):
+        name = urllib.parse.urlsplit(url).netloc
+        try:
+            return self.hosts[name]
+        except KeyError:
+            host = self.hosts[name] = Host(name, self.rate, self.burst, self.concurrency)
+            return host
+
+    async def acquire(self, url):
+        host = self.host(url)
+        async with host.condition:
+            while True:
+                now = time.monotonic()
+                host.refill(now)
+                delay = host.delay(now)
+                if delay == 0:
+                    host.active += 1
+                    if host.rate:
+                        host.tokens -= 1
+                    return host
+                try:
+                    await asyncio.wait_for(host.condition.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, host):
+        async with host.condition:
+            host.active -= 1
+            host.condition.notify_all()
+
+    def feedback(self, host, status=None, latency=None, retry_after=None):
+        if status is None or status in self.RETRY_STATUS_CODES:
+            host.failures += 1
+            host.concurrency = max(self.min_concurrency, host.concurrency * self.decrease)
+            pause = self.retry_after(retry_after)
+            if pause is None:
+                pause = min(self.backoff_max, self.backoff * 2 ** (host.failures - 1))
+            host.blocked_until = max(host.blocked_until, time.monotonic() + pause)
+            logger.debug('Backing off {} for {:.2f}s, concurrency {:.2f}'.format(host.name, pause, host.concurrency))
+            return status is not None
+        host.failures = 0
+        if latency is not None and latency > self.latency_target:
+            host.concurrency = max(self.min_concurrency, host.concurrency * self.decrease)
+        else:
+            host.concurrency = min(self.concurrency, host.concurrency + self.increase / host.concurrency)
+        return False
+
+    def retry_after(self, value):
+        if not value:
+            return None
+        if value.isdigit():
+            return min(self.backoff_max, int(value))
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return min(self.backoff_max, max(0, date.timestamp() - time.time()))
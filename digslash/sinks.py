@@ -0,0 +1,135 @@
+import abc
+import base64
+import gzip
+import json
+import os
+import pathlib
+import sqlite3
+
+
+def serialize(url, entry):
+    record = {'url': url}
+    record.update(entry)
+    if 'body' in record:
+        record['body'] = base64.b64encode(record['body']).decode('ascii')
+    return json.dumps(record)
+
+
+def deserialize(line):
+    entry = json.loads(line)
+    url = entry.pop('url')
+    if 'body' in entry:
+        entry['body'] = base64.b64decode(entry['body'])
+    return url, entry
+
+
+class Sink(abc.ABC):
+
+    # Once a sink keeps the full entries, Site only holds the compact keys in memory
+    keeps_entries = True
+
+    @abc.abstractmethod
+    def write(self, url, entry):
+        pass
+
+    def close(self):
+        pass
+
+
+class NDJSONSink(Sink):
+
+    def __init__(self, path):
+        self.path = path
+        self.handle = self.open()
+
+    def open(self):
+        return open(self.path, 'w', encoding='utf-8')
+
+    def write(self, url, entry):
+        self.handle.write(serialize(url, entry) + '\n')
+
+    def close(self):
+        self.handle.close()
+
+
+class GzipNDJSONSink(NDJSONSink):
+
+    def open(self):
+        return gzip.open(self.path, 'wt', encoding='utf-8')
+
+
+class StreamSink(Sink):
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.broken = False
+
+    def write(self, url, entry):
+        if self.broken:
+            return
+        try:
+            self.handle.write(serialize(url, entry) + '\n')
+        except BrokenPipeError:
+            # The reader went away (e.g. piped into head), the owner decides whether to go on
+            self.broken = True
+
+    def flush(self):
+        if not self.broken:
+            try:
+                self.handle.flush()
+            except BrokenPipeError:
+                self.broken = True
+
+    def close(self):
+        # The stream belongs to the caller and may be shared by several sites
+        self.flush()
+
+
+class SQLiteSink(Sink):
+
+    def __init__(self, path, batch_size=1000):
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results (url TEXT PRIMARY KEY, entry TEXT, body BLOB)')
+        self.pending = list()
+
+    def write(self, url, entry):
+        entry = entry.copy()
+        body = entry.pop('body', None)
+        self.pending.append((url, json.dumps(entry), body))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?)', self.pending)
+        self.pending.clear()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+class ContentStore(Sink):
+
+    keeps_entries = False
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def locate(self, checksum):
+        return self.path / checksum[:2] / checksum
+
+    def write(self, url, entry):
+        if 'body' not in entry:
+            return
+        location = self.locate(entry['checksum'])
+        if not location.exists():
+            location.parent.mkdir(exist_ok=True)
+            # Renamed into place once complete, an interrupted write never looks like a stored body
+            temporary = location.with_name(location.name + '.tmp')
+            temporary.write_bytes(entry['body'])
+            os.replace(temporary, location)
@@ -1,4 +1,5 @@
 import asyncio
+import time
 import urllib.parse
 import ssl
 from collections import defaultdict
@@ -6,12 +7,51 @@ from collections import defaultdict
 import aiohttp
 
 from digslash import (
+    __version__,
+    caches,
+    extractors as extractors_module,
+    fingerprints,
+    frontiers,
     logger,
     nodes,
+    records,
+    states,
+    urls,
 )
 
 
-class Site:
+NOT_MODIFIED = object()
+RETRY = object()
+
+
+# Pooled session setup shared by Site and Crawler, both carry the same connection options
+class Pooled:
+
+    def connector_create(self):
+        return aiohttp.TCPConnector(
+            limit=self.connections_limit,
+            limit_per_host=self.connections_limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+            ssl=self.ssl_context,
+        )
+
+    def session_create(self):
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(self.on_connection_create)
+        trace_config.on_connection_reuseconn.append(self.on_connection_reuse)
+        if self.stats is not None:
+            self.stats.trace(trace_config)
+        return aiohttp.ClientSession(connector=self.connector_create(), trace_configs=[trace_config])
+
+    async def on_connection_create(self, session, context, params):
+        self.connections['created'] += 1
+
+    async def on_connection_reuse(self, session, context, params):
+        self.connections['reused'] += 1
+
+
+class Site(Pooled):
 
     ACCEPTED_CONTENT_TYPES = (
         'text/html',
@@ -33,6 +73,42 @@ class Site:
         '#',
     )
 
+    CHUNK_SIZE = 65536
+
+    TRANSIENT_ATTRS = (
+        'queue',
+        'results',
+        'workers',
+        'checksums_index',
+        'ssl_context',
+        'connector_factory',
+        'session',
+        'connections',
+        'executor',
+        'frontier',
+        'state',
+        'sinks',
+        'subscribers',
+        'previous',
+        'scheduler',
+        'semaphore',
+        'near_duplicates',
+        'stats',
+        'released',
+        'cancelled',
+        'url_table',
+        'parse_cache',
+        'fetch_store',
+        'retries',
+    )
+
+    COMPACT_KEYS = (
+        'source',
+        'encoding',
+        'checksum',
+        'near_duplicate_of',
+    )
+
     def __init__(self,
         base,
         deduplicate=True,
@@ -44,48 +120,315 @@ class Site:
         ignored_status_codes=None,
         verify_ssl=True,
         body_limit=1000000,
-        paths_ignored=PATHS_IGNORED
+        paths_ignored=PATHS_IGNORED,
+        connections_limit=100,
+        connections_limit_per_host=0,
+        keepalive_timeout=15,
+        dns_cache_ttl=10,
+        connector_factory=None,
+        executor=None,
+        frontier=None,
+        checksums_index=None,
+        parser_backend='bs4',
+        incremental=False,
+        state_path=None,
+        sinks=None,
+        store_links=False,
+        previous=None,
+        scheduler=None,
+        near_duplicates_distance=None,
+        hash_algorithm='md5',
+        sort_query=True,
+        url_cache_size=65536,
+        extractors=None,
+        seed_robots=False,
+        stats=None,
+        deadline=None,
+        drain_timeout=10,
+        compact=False,
+        parse_cache=None,
+        fetch_store=None
     ):
         self.base = base
         self.urlsplit = urllib.parse.urlsplit(base)
         self.deduplicate = deduplicate
         self.workers_no = workers_no
         self.limit = limit
+        self.deadline = deadline
+        self.drain_timeout = drain_timeout
+        self.draining = False
+        self.in_flight = 0
+        self.released = None
+        self.cancelled = None
         self.queue = None
-        self.results = defaultdict(dict)
+        self.compact = compact
+        # URLs are interned to integer IDs shared by the results, the checksums index and the frontier
+        self.url_table = records.URLTable() if compact else None
         self.workers = list()
-        self.checksums_index = dict()
         self.store_content = store_content
-        self.accepted_content_types = accepted_content_types
+        self.accepted_content_types = tuple(accepted_content_types)
+        self.extractors = extractors
+        if extractors:
+            self.accepted_content_types += tuple(
+                content_type for content_type in extractors if content_type not in self.accepted_content_types
+            )
+        self.seed_robots = seed_robots
         self.ignored_status_codes = tuple() if not ignored_status_codes else ignored_status_codes
         self.verify_ssl = verify_ssl
         self.body_limit = body_limit
         self.paths_ignored = paths_ignored
+        self.urls = urls.Resolver(base, paths_ignored, sort_query, url_cache_size)
         self.store_headers = store_headers
         self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
         self.ssl_context.check_hostname = False
         if not verify_ssl:
             self.ssl_context.verify_mode = ssl.CERT_NONE
+        self.connections_limit = connections_limit
+        self.connections_limit_per_host = connections_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.connector_factory = connector_factory
+        self.executor = executor
+        self.frontier = frontier
+        if parser_backend not in nodes.Node.PARSER_BACKENDS:
+            raise ValueError('Unknown parser backend {}'.format(parser_backend))
+        self.parser_backend = parser_backend
+        if hash_algorithm not in nodes.HASH_ALGORITHMS:
+            raise ValueError('Unsupported hash algorithm {}'.format(hash_algorithm))
+        self.hash_algorithm = hash_algorithm
+        if compact:
+            digest_size = nodes.HASH_ALGORITHMS[hash_algorithm]().digest_size
+            self.results = records.Results(self.url_table, digest_size)
+        else:
+            self.results = defaultdict(dict)
+        if checksums_index is not None:
+            self.checksums_index = checksums_index
+        elif compact:
+            self.checksums_index = records.DigestIndex(self.url_table, digest_size)
+        else:
+            self.checksums_index = dict()
+        self.incremental = incremental
+        self.state_path = state_path
+        self.state = None
+        self.sinks = list() if not sinks else list(sinks)
+        self.subscribers = list()
+        self.store_links = store_links
+        self.previous = dict() if not previous else previous
+        self.scheduler = scheduler
+        self.near_duplicates_distance = near_duplicates_distance
+        if near_duplicates_distance is None:
+            self.near_duplicates = None
+        else:
+            self.near_duplicates = fingerprints.SimHashIndex(near_duplicates_distance)
+        self.retries = dict()
+        self.recrawl = {
+            'not_modified': 0,
+            'unchanged': 0,
+            'bytes_saved': 0,
+            'parses_saved': 0,
+            'parses': 0,
+            'parse_seconds': 0.0,
+        }
+        self.stats = stats
+        self.parse_cache = parse_cache
+        self.parse_cache_prefix = None
+        self.fetch_store = fetch_store
+        self.session = None
+        self.session_owned = False
+        self.semaphore = None
+        self.connections = {
+            'created': 0,
+            'reused': 0,
+        }
+
+    def __getstate__(self):
+        # Only the configuration travels to executor processes, never the crawl state
+        state = self.__dict__.copy()
+        for attr in self.TRANSIENT_ATTRS:
+            state[attr] = None
+        # Stats and the parse cache stay behind, nodes parsed in executor processes still report
+        # their timings and raw links back
+        state['instrumented'] = self.stats is not None
+        state['cache_parses'] = self.parse_cache is not None
+        return state
+
+    @property
+    def instrumented(self):
+        # Executor copies have no stats, they carry the flag set by __getstate__ instead
+        return self.stats is not None or self.__dict__.get('instrumented', False)
+
+    @property
+    def cache_parses(self):
+        return self.parse_cache is not None or self.__dict__.get('cache_parses', False)
 
     async def worker(self):
-        while self.is_populated():
-            if self.limit and len(self.results) >= self.limit:
+        # Workers block on the frontier and live until stop(), the crawl ends once queue.join() returns
+        while True:
+            if self.stats is None:
+                url, source = await self.queue.get()
+            else:
+                started = time.perf_counter()
+                url, source = await self.queue.get()
+                self.stats.observe('worker_idle', time.perf_counter() - started)
+                self.stats.gauge('frontier_size', self.queue.qsize())
+            try:
+                admitted = not self.draining and await self.budget_acquire()
+            except asyncio.CancelledError:
+                self.queue.release(url)
+                raise
+            if not admitted:
+                # Never fetched, the URL is dropped along with the rest of the frontier
+                self.queue.drop(url)
                 self.queue_flush()
-                break
-            url, source = await self.queue.get()
-            logger.info('Processing {}'.format(url))
-            response = await self.fetch(url)
-            if response:
-                body, encoding, headers = response
-                node = nodes.Node(self, body, encoding, current=url)
-                results = node.process()
-                if results:
-                    self.done(url, source, results, body, headers)
-                    self.queue_add(results['links'], url)
-            self.worker_done()
-
-    def worker_done(self):
-        self.queue.task_done()
+                continue
+            try:
+                retry = await self.visit(url, source)
+            except asyncio.CancelledError:
+                # Not marked as finished but handed back, a resumed crawl fetches it again
+                self.queue.release(url)
+                raise
+            except Exception:
+                logger.exception('Processing {} failed'.format(url))
+                retry = False
+            finally:
+                self.budget_release()
+            if retry:
+                logger.debug('Retrying {} later'.format(url))
+                self.queue.retry(url, source)
+                continue
+            if self.state:
+                self.state.finished(url)
+            self.worker_done(url)
+
+    async def budget_acquire(self):
+        # Results plus in-flight requests never exceed the limit, a failed request hands its slot back
+        while self.limit and len(self.results) + self.in_flight >= self.limit:
+            if not self.in_flight:
+                return False
+            self.released.clear()
+            await self.released.wait()
+        self.in_flight += 1
+        return True
+
+    def budget_release(self):
+        self.in_flight -= 1
+        self.released.set()
+
+    async def visit(self, url, source):
+        logger.info('Processing {}'.format(url))
+        previous = self.previous.get(url)
+        if previous is not None and 'links' not in previous:
+            previous = None
+        if self.incremental:
+            node = nodes.Node(self, None, current=url)
+
+            # Chunks come with the charset and Content-Type of the response, the node sniffs with the charset
+            def on_chunk(chunk, charset=None, content_type=None):
+                if self.streamed(content_type):
+                    links = node.feed(chunk, declared=charset)
+                    # Links of a near duplicate are not expanded, they wait for done() to decide
+                    if self.near_duplicates is None:
+                        self.queue_add(links, url)
+
+            response = await self.fetch(url, on_chunk, previous)
+        else:
+            response = await self.fetch(url, previous=previous)
+        results = None
+        if response is RETRY:
+            return True
+        if response is NOT_MODIFIED:
+            logger.debug('Not modified, reusing previous results for {}'.format(url))
+            self.recrawl['not_modified'] += 1
+            self.recrawl['bytes_saved'] += self.previous_size(previous)
+            body, headers = previous.get('body'), previous.get('headers')
+            results = self.previous_results(previous)
+        elif response:
+            body, encoding, content_type, headers = response
+            if self.incremental and self.streamed(content_type):
+                results = node.close()
+            elif previous is not None and nodes.checksum(body, self.hash_algorithm) == previous['checksum']:
+                logger.debug('Checksum unchanged, reusing previous links for {}'.format(url))
+                self.recrawl['unchanged'] += 1
+                results = self.previous_results(previous)
+            else:
+                started = time.perf_counter()
+                results = await self.parse(body, encoding, url, content_type)
+                self.recrawl['parses'] += 1
+                self.recrawl['parse_seconds'] += time.perf_counter() - started
+        if results and self.done(url, source, results, body, headers):
+            self.queue_add(results['links'], url)
+        return False
+
+    def streamed(self, content_type):
+        # Extractors need the whole body, their Content-Types are parsed once downloaded
+        return not self.extractors or content_type not in self.extractors
+
+    def previous_results(self, previous):
+        self.recrawl['parses_saved'] += 1
+        return {
+            'encoding': previous['encoding'],
+            'checksum': previous['checksum'],
+            'links': set(previous['links']),
+        }
+
+    def previous_size(self, previous):
+        if previous.get('body') is not None:
+            return len(previous['body'])
+        for name, value in previous.get('headers', dict()).items():
+            if name.lower() == 'content-length' and value.isdigit():
+                return int(value)
+        return 0
+
+    def recrawl_report(self):
+        report = self.recrawl.copy()
+        if report['parses']:
+            report['parse_seconds_saved'] = report['parses_saved'] * report['parse_seconds'] / report['parses']
+        else:
+            report['parse_seconds_saved'] = 0.0
+        return report
+
+    async def parse(self, body, encoding, url, content_type=None):
+        links = checksum = key = None
+        if self.parse_cache is not None:
+            # Hashing first lets byte-identical bodies skip the parser altogether
+            checksum = nodes.checksum(body, self.hash_algorithm)
+            key = self.parse_cache_key(checksum, content_type)
+            links = self.parse_cache.get(key)
+        if links is not None or self.executor is None:
+            results = nodes.process(self, body, encoding, url, content_type, links, checksum)
+        else:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(
+                self.executor, nodes.process, self, body, encoding, url, content_type, None, checksum
+            )
+        if results is not None and 'extracted' in results:
+            self.parse_cache.put(key, results.pop('extracted'))
+        if results is not None and 'timings' in results:
+            for stage, seconds in results.pop('timings').items():
+                self.stats.observe('node_' + stage, seconds)
+        return results
+
+    def parse_cache_config(self):
+        extractors = tuple()
+        if self.extractors:
+            extractors = tuple(sorted(
+                (name, getattr(extractor, '__module__', ''), getattr(extractor, '__qualname__', repr(extractor)))
+                for name, extractor in self.extractors.items()
+            ))
+        return caches.fingerprint(
+            __version__, self.parser_backend, nodes.Node.FOLLOWED_ELEMENTS_ATTRS, self.hash_algorithm, extractors
+        )
+
+    def parse_cache_key(self, checksum, content_type=None):
+        # The configuration is fixed for a crawl, crawl() fingerprints it once
+        if self.parse_cache_prefix is None:
+            self.parse_cache_prefix = self.parse_cache_config()
+        if self.extractors:
+            return '{} {} {}'.format(self.parse_cache_prefix, content_type, checksum)
+        return '{} {}'.format(self.parse_cache_prefix, checksum)
+
+    def worker_done(self, url):
+        self.queue.done(url)
 
     def done(self, url, source, results, body, headers):
         entry = {
@@ -97,30 +440,68 @@ class Site:
             entry['body'] = body
         if self.store_headers:
             entry['headers'] = headers
+        if self.store_links:
+            entry['links'] = sorted(results['links'])
         if self.deduplicate:
-            if results['checksum'] not in self.checksums_index:
-                self.results[url] = entry
-                self.checksums_index[results['checksum']] = url
-        else:
-            self.results[url] = entry
+            # setdefault keeps the check and insert atomic, also for shared indexes
+            if self.checksums_index.setdefault(results['checksum'], url) != url:
+                return True
+            if self.state:
+                self.state.checksum(results['checksum'], url)
+        expand = True
+        if self.near_duplicates is not None and 'simhash' in results:
+            original = self.near_duplicates.lookup(results['simhash'])
+            if original is None:
+                self.near_duplicates.add(results['simhash'], url)
+            else:
+                logger.debug('Near duplicate of {}, not expanding {}'.format(original, url))
+                entry['near_duplicate_of'] = original
+                expand = False
+        self.store(url, entry)
+        return expand
+
+    def store(self, url, entry):
+        if self.stats is not None:
+            self.stats.incr('pages')
+        for sink in self.sinks:
+            sink.write(url, entry)
+        for subscriber in self.subscribers:
+            subscriber.put_nowait((url, entry))
+        if any(sink.keeps_entries for sink in self.sinks):
+            # Sinks own the full entries, only the compact index stays in memory
+            entry = {key: entry[key] for key in self.COMPACT_KEYS if key in entry}
+        self.results[url] = entry
+        if self.state:
+            self.state.result(url, entry)
+
+    async def iter_results(self):
+        subscriber = asyncio.Queue()
+        self.subscribers.append(subscriber)
+        try:
+            while True:
+                result = await subscriber.get()
+                if result is None:
+                    break
+                yield result
+        finally:
+            self.subscribers.remove(subscriber)
 
     def queue_flush(self):
-        for _ in range(self.queue.qsize()):
-            self.queue.get_nowait()
-            self.queue.task_done()
+        self.queue.flush()
 
     def queue_add(self, url_list, source=''):
+        if self.draining:
+            return
+        started = time.perf_counter()
         for url in url_list:
-            if (
-                url not in self.results and
-                url not in dict(self.queue._queue) and  # FIXME: Optimize
-                url != source
-            ):
+            if url not in self.queue and url != source:
                 logger.debug('Added to queue: ' + url)
                 self.queue.put_nowait((url, source))
-
-    def is_populated(self):
-        return not self.queue.empty()
+                if self.state:
+                    self.state.queued(url, source)
+        if self.stats is not None:
+            self.stats.observe('queue_add', time.perf_counter() - started)
+            self.stats.gauge('frontier_size', self.queue.qsize())
 
     def handle_worker_result(self, worker):
         try:
@@ -130,35 +511,254 @@ class Site:
         except Exception:
             logger.exception('Exception raised by {}'.format(worker))
 
+    def state_restore(self):
+        for url, entry in self.state.load_results():
+            self.results[url] = entry
+        for checksum, url in self.state.load_checksums():
+            self.checksums_index[checksum] = url
+        for url, source, done in self.state.load_frontier():
+            if done:
+                self.queue.seen.add(url)
+            else:
+                self.queue.put_nowait((url, source))
+        logger.info('Restored {} results and {} queued URLs from {}'.format(
+            len(self.results), self.queue.qsize(), self.state_path
+        ))
+
+    async def seed(self):
+        robots = urllib.parse.urljoin(self.base, '/robots.txt')
+        links = [urllib.parse.urljoin(self.base, '/sitemap.xml')]
+        response = await self.fetch(robots)
+        if response and response is not RETRY:
+            body, encoding, content_type, headers = response
+            # sniff() skips bogus charset labels
+            links.extend(extractors_module.extract_robots(body.decode(nodes.sniff(body, encoding), 'replace')))
+        seeds = set()
+        for link in links:
+            url = self.urls.resolve(link, self.urlsplit)
+            if url is not None:
+                seeds.add(url)
+        logger.debug('Seeding {} URLs from {}'.format(len(seeds), robots))
+        self.queue_add(seeds, robots)
+
+    async def resume(self, path):
+        self.state_path = path
+        await self.crawl()
+
+    def frontier_create(self):
+        if self.frontier is not None:
+            return self.frontier
+        if self.compact:
+            return frontiers.CompactFrontier(self.url_table)
+        return frontiers.Frontier()
+
     async def crawl(self):
-        self.queue = asyncio.Queue()
+        self.queue = self.frontier_create()
+        self.draining = False
+        self.in_flight = 0
+        self.released = asyncio.Event()
+        self.cancelled = asyncio.Event()
+        if self.session is None:
+            self.session = self.session_create()
+            self.session_owned = True
+        if self.state_path:
+            self.state = states.State(self.state_path)
+            self.state_restore()
         for i in range(self.workers_no):
             worker = asyncio.create_task(self.worker())
             worker.add_done_callback(self.handle_worker_result)
             self.workers.append(worker)
-        # Initialize queue with the base URL
-        self.queue_add([self.base])
-        await self.queue.join()
+        try:
+            if self.stats is not None:
+                self.stats.start()
+            if self.parse_cache is not None:
+                self.parse_cache.open()
+                self.parse_cache_prefix = self.parse_cache_config()
+            # Initialize queue with the base URL
+            self.queue_add([self.base])
+            if self.seed_robots:
+                await self.seed()
+            if self.deadline is None:
+                await self.join()
+            else:
+                try:
+                    await asyncio.wait_for(self.join(), self.deadline)
+                except asyncio.TimeoutError:
+                    logger.info('Crawl deadline of {}s reached, draining'.format(self.deadline))
+                    await self.drain()
+        finally:
+            await self.stop()
+        if self.previous:
+            logger.info('Re-crawl report {}'.format(self.recrawl_report()))
+
+    async def join(self):
+        # Workers cancelled by a drain leave their URLs unfinished, the crawl ends all the same
+        waiters = [asyncio.ensure_future(self.queue.join()), asyncio.ensure_future(self.cancelled.wait())]
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    async def drain(self):
+        # No new URLs are taken, requests in flight get drain_timeout seconds to finish
+        self.draining = True
+        self.queue_flush()
+        try:
+            await asyncio.wait_for(self.queue.join(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning('Drain timeout reached, cancelling {} requests in flight'.format(self.in_flight))
+            for worker in self.workers:
+                worker.cancel()
+            self.cancelled.set()
 
     async def stop(self):
         for worker in self.workers:
             worker.cancel()
-        await asyncio.gather(*self.workers)
-        self.workers = None
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = list()
+        if self.session_owned:
+            await self.session.close()
+            self.session_owned = False
+        self.session = None
+        if self.state is not None:
+            self.state.close()
+            self.state = None
+        for sink in self.sinks:
+            sink.close()
+        if self.fetch_store is not None:
+            self.fetch_store.flush()
+        if self.parse_cache is not None:
+            self.parse_cache.close()
+            logger.info('Parse cache {}'.format(self.parse_cache.info()))
+            if self.stats is not None:
+                self.stats.gauge('parse_cache_hits', self.parse_cache.hits)
+                self.stats.gauge('parse_cache_misses', self.parse_cache.misses)
+        for subscriber in self.subscribers:
+            subscriber.put_nowait(None)
+        if self.stats is not None:
+            self.stats.gauge('frontier_size', self.queue.qsize())
+            self.stats.gauge('results', len(self.results))
+            await self.stats.stop()
 
-    async def fetch(self, url):
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, ssl_context=self.ssl_context) as response:
-                    body = await response.read()
+    def connector_create(self):
+        if self.connector_factory:
+            return self.connector_factory(self)
+        return super().connector_create()
+
+    def conditional_headers(self, previous):
+        headers = dict()
+        for name, value in previous.get('headers', dict()).items():
+            if name.lower() == 'etag':
+                headers['If-None-Match'] = value
+            elif name.lower() == 'last-modified':
+                headers['If-Modified-Since'] = value
+        return headers
+
+    async def fetch(self, url, on_chunk=None, previous=None):
+        if self.stats is None:
+            return await self.request_limited(url, on_chunk, previous)
+        started = time.perf_counter()
+        try:
+            return await self.request_limited(url, on_chunk, previous)
+        finally:
+            self.stats.observe('fetch', time.perf_counter() - started)
+
+    async def request_limited(self, url, on_chunk=None, previous=None):
+        if self.fetch_store is not None and self.fetch_store.mode == 'replay':
+            # Served from disk, no connection, scheduler or semaphore involved
+            return self.replay(url, on_chunk, previous)
+        if self.semaphore is None:
+            return await self.request(url, on_chunk, previous)
+        async with self.semaphore:
+            return await self.request(url, on_chunk, previous)
+
+    async def request(self, url, on_chunk=None, previous=None):
+        headers = self.conditional_headers(previous) if previous else None
+        host = await self.scheduler.acquire(url) if self.scheduler else None
+        started = time.monotonic()
+        try:
+            # Sessions shared through a Crawler carry its SSL context, the site's own is given per request
+            async with self.session.get(url, headers=headers, ssl=self.ssl_context) as response:
+                if host is not None:
+                    retry = self.scheduler.feedback(
+                        host, response.status, time.monotonic() - started, response.headers.get('Retry-After')
+                    )
+                    if retry and self.retries.get(url, 0) < self.scheduler.max_retries:
+                        self.retries[url] = self.retries.get(url, 0) + 1
+                        return RETRY
+                body = None
+                try:
+                    if response.status == 304 and previous:
+                        return NOT_MODIFIED
                     if response.status not in self.ignored_status_codes:
-                        content_type = response.content_type.split(';')[0]
                         if response.content_type in self.accepted_content_types:
                             logger.debug('Received response with Content-Type {} for {}'.format(response.content_type, url))
-                            return body[:self.body_limit], response.get_encoding(), dict(response.headers)
+                            body = await self.read(response, on_chunk)
+                            return body, response.charset, response.content_type, dict(response.headers)
                         else:
                             logger.debug('Unsupported Content-Type {}'.format(response.content_type))
                     else:
                         logger.debug('Status {}, skip processing'.format(response.status))
-            except Exception as exc:
-                logger.debug('Exception {}, skip processing'.format(exc))
+                finally:
+                    if self.fetch_store is not None:
+                        self.fetch_store.record(
+                            url, response.status, response.content_type, response.charset, dict(response.headers), body
+                        )
+        except Exception as exc:
+            if host is not None:
+                self.scheduler.feedback(host)
+            logger.debug('Exception {}, skip processing'.format(exc))
+        finally:
+            if host is not None:
+                await self.scheduler.release(host)
+
+    def replay(self, url, on_chunk=None, previous=None):
+        response = self.fetch_store.get(url)
+        if response is None:
+            logger.debug('Not recorded, skip processing {}'.format(url))
+            return
+        if response.status == 304 and previous:
+            return NOT_MODIFIED
+        if response.status in self.ignored_status_codes:
+            logger.debug('Status {}, skip processing'.format(response.status))
+            return
+        if response.content_type not in self.accepted_content_types:
+            logger.debug('Unsupported Content-Type {}'.format(response.content_type))
+            return
+        if response.body is None:
+            logger.debug('Body of {} was not recorded, skip processing'.format(url))
+            return
+        body = response.body[:self.body_limit] if self.body_limit else response.body
+        if on_chunk is not None:
+            for start in range(0, len(body), self.CHUNK_SIZE):
+                on_chunk(body[start:start + self.CHUNK_SIZE], response.charset, response.content_type)
+        return body, response.charset, response.content_type, response.headers
+
+    async def read(self, response, on_chunk=None):
+        started = time.perf_counter()
+        # No body limit (0 or None) reads the whole body, also in replay()
+        limit = self.body_limit or None
+        # Content-Length counts the encoded bytes, the body limit applies to the decoded ones
+        decoded = self.session.auto_decompress and response.headers.get('Content-Encoding', 'identity') != 'identity'
+        if response.content_length is not None and not decoded and (limit is None or response.content_length < limit):
+            limit = response.content_length
+        chunks = list()
+        received = 0
+        async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+            if limit is not None and received + len(chunk) > limit:
+                chunk = chunk[:limit - received]
+            chunks.append(chunk)
+            received += len(chunk)
+            if on_chunk is not None:
+                on_chunk(chunk, response.charset, response.content_type)
+            if limit is not None and received >= limit:
+                break
+        if not response.content.at_eof():
+            # Closing drops the connection instead of draining the rest of the body into the pool
+            logger.debug('Body limit reached after {} bytes, closing {}'.format(received, response.url))
+            response.close()
+        if self.stats is not None:
+            self.stats.observe('body', time.perf_counter() - started)
+            self.stats.incr('bytes', received)
+        return b''.join(chunks)
@@ -0,0 +1,78 @@
+import json
+import sqlite3
+
+
+class State:
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS frontier (url TEXT PRIMARY KEY, source TEXT, done INTEGER DEFAULT 0)',
+        'CREATE TABLE IF NOT EXISTS results (url TEXT PRIMARY KEY, entry TEXT, body BLOB)',
+        'CREATE TABLE IF NOT EXISTS checksums (checksum TEXT PRIMARY KEY, url TEXT)',
+    )
+
+    def __init__(self, path, batch_size=1000):
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        for statement in self.SCHEMA:
+            self.connection.execute(statement)
+        self.connection.commit()
+        self.queued_pending = list()
+        self.finished_pending = list()
+        self.results_pending = list()
+        self.checksums_pending = list()
+        self.pending = 0
+
+    def queued(self, url, source):
+        self.queued_pending.append((url, source))
+        self.checkpoint()
+
+    def finished(self, url):
+        self.finished_pending.append((url,))
+        self.checkpoint()
+
+    def result(self, url, entry):
+        entry = entry.copy()
+        body = entry.pop('body', None)
+        self.results_pending.append((url, json.dumps(entry), body))
+        self.checkpoint()
+
+    def checksum(self, checksum, url):
+        self.checksums_pending.append((checksum, url))
+        self.checkpoint()
+
+    def checkpoint(self):
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        with self.connection:
+            self.connection.executemany('INSERT OR IGNORE INTO frontier (url, source) VALUES (?, ?)', self.queued_pending)
+            self.connection.executemany('UPDATE frontier SET done = 1 WHERE url = ?', self.finished_pending)
+            self.connection.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?)', self.results_pending)
+            self.connection.executemany('INSERT OR IGNORE INTO checksums VALUES (?, ?)', self.checksums_pending)
+        self.queued_pending.clear()
+        self.finished_pending.clear()
+        self.results_pending.clear()
+        self.checksums_pending.clear()
+        self.pending = 0
+
+    def load_frontier(self):
+        return self.connection.execute('SELECT url, source, done FROM frontier ORDER BY rowid')
+
+    def load_results(self):
+        for url, entry, body in self.connection.execute('SELECT url, entry, body FROM results ORDER BY rowid'):
+            entry = json.loads(entry)
+            if body is not None:
+                entry['body'] = body
+            yield url, entry
+
+    def load_checksums(self):
+        return self.connection.execute('SELECT checksum, url FROM checksums')
+
+    def close(self):
+        self.flush()
+        self.connection.close()
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+
+from digslash import logger
+
+
+class Stats:
+
+    FORMATS = (
+        'json',
+        'prometheus',
+    )
+
+    def __init__(self, path=None, interval=10.0, format='json', prefix='digslash'):
+        if format not in self.FORMATS:
+            raise ValueError('Unknown stats format {}'.format(format))
+        self.path = path
+        self.interval = interval
+        self.format = format
+        self.prefix = prefix
+        self.started = time.monotonic()
+        self.counters = dict()
+        self.gauges = dict()
+        # name -> [count, total seconds, max seconds]
+        self.timings = dict()
+        self.reporter = None
+        self.users = 0
+
+    def incr(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    def observe(self, name, seconds):
+        timing = self.timings.get(name)
+        if timing is None:
+            self.timings[name] = [1, seconds, seconds]
+        else:
+            timing[0] += 1
+            timing[1] += seconds
+            if seconds > timing[2]:
+                timing[2] = seconds
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.started
+        return {
+            'time': time.time(),
+            'elapsed': elapsed,
+            'pages_per_second': self.counters.get('pages', 0) / elapsed if elapsed else 0.0,
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+            'timings': {
+                name: {'count': count, 'total': total, 'mean': total / count, 'max': maximum}
+                for name, (count, total, maximum) in self.timings.items()
+            },
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), sort_keys=True)
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = list()
+
+        def metric(name, kind, value):
+            lines.append('# TYPE {}_{} {}'.format(self.prefix, name, kind))
+            lines.append('{}_{} {}'.format(self.prefix, name, value))
+
+        metric('elapsed_seconds', 'gauge', snapshot['elapsed'])
+        metric('pages_per_second', 'gauge', snapshot['pages_per_second'])
+        for name, value in sorted(snapshot['counters'].items()):
+            metric(name + '_total', 'counter', value)
+        for name, value in sorted(snapshot['gauges'].items()):
+            metric(name, 'gauge', value)
+        for name, timing in sorted(snapshot['timings'].items()):
+            lines.append('# TYPE {}_{}_seconds summary'.format(self.prefix, name))
+            lines.append('{}_{}_seconds_count {}'.format(self.prefix, name, timing['count']))
+            lines.append('{}_{}_seconds_sum {}'.format(self.prefix, name, timing['total']))
+            metric(name + '_seconds_max', 'gauge', timing['max'])
+        return '\n'.join(lines) + '\n'
+
+    def write(self):
+        if self.format == 'json':
+            with open(self.path, 'a') as fil:
+                fil.write(self.to_json() + '\n')
+        else:
+            # Scrapers must never see a half written exposition file
+            temporary = self.path + '.tmp'
+            with open(temporary, 'w') as fil:
+                fil.write(self.to_prometheus())
+            os.replace(temporary, self.path)
+
+    async def report(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.write()
+
+    def start(self):
+        # Sites of one crawler share the stats, the first one starts the clock
+        self.users += 1
+        if self.users > 1:
+            return
+        self.started = time.monotonic()
+        if self.path:
+            self.reporter = asyncio.create_task(self.report())
+
+    async def stop(self):
+        self.users -= 1
+        if self.users > 0:
+            return
+        if self.reporter is not None:
+            self.reporter.cancel()
+            await asyncio.gather(self.reporter, return_exceptions=True)
+            self.reporter = None
+        if self.path:
+            self.write()
+        logger.info('Stats {}'.format(self.to_json()))
+
+    def trace(self, trace_config=None):
+        if trace_config is None:
+            trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self.on_request_start)
+        trace_config.on_dns_resolvehost_start.append(self.on_dns_start)
+        trace_config.on_dns_resolvehost_end.append(self.on_dns_end)
+        trace_config.on_connection_create_start.append(self.on_connect_start)
+        trace_config.on_connection_create_end.append(self.on_connect_end)
+        trace_config.on_request_end.append(self.on_request_end)
+        trace_config.on_request_exception.append(self.on_request_exception)
+        return trace_config
+
+    async def on_request_start(self, session, context, params):
+        context.request_started = time.perf_counter()
+
+    async def on_dns_start(self, session, context, params):
+        context.dns_started = time.perf_counter()
+
+    async def on_dns_end(self, session, context, params):
+        self.observe('dns', time.perf_counter() - context.dns_started)
+
+    async def on_connect_start(self, session, context, params):
+        context.connect_started = time.perf_counter()
+
+    async def on_connect_end(self, session, context, params):
+        self.observe('connect', time.perf_counter() - context.connect_started)
+
+    async def on_request_end(self, session, context, params):
+        # Fired once the response headers are in, the body is timed by the reader
+        self.observe('ttfb', time.perf_counter() - context.request_started)
+        self.incr('responses')
+
+    async def on_request_exception(self, session, context, params):
+        self.incr('request_errors')
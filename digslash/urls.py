@@ -0,0 +1,92 @@
+import functools
+import re
+import urllib.parse
+
+
+SCHEMES = (
+    'http',
+    'https',
+)
+
+DEFAULT_PORTS = {
+    'http': '80',
+    'https': '443',
+}
+
+
+def remove_dot_segments(path):
+    if '.' not in path:
+        return path
+    output = list()
+    for segment in path.split('/'):
+        if segment == '..':
+            if len(output) > 1:
+                output.pop()
+        elif segment != '.':
+            output.append(segment)
+    if path.endswith(('/.', '/..')):
+        output.append('')
+    return '/'.join(output)
+
+
+def canonical_netloc(scheme, netloc):
+    netloc = netloc.lower()
+    if netloc.endswith(']'):
+        return netloc
+    host, sep, port = netloc.rpartition(':')
+    if sep and (not port or port == DEFAULT_PORTS.get(scheme)):
+        return host
+    return netloc
+
+
+class Resolver:
+
+    def __init__(self, base, paths_ignored=tuple(), sort_query=True, cache_size=65536):
+        self.base = base
+        self.paths_ignored = paths_ignored
+        self.sort_query = sort_query
+        self.cache_size = cache_size
+        split = urllib.parse.urlsplit(base)
+        self.scheme = split.scheme
+        self.netloc = canonical_netloc(split.scheme, split.netloc)
+        if paths_ignored:
+            self.ignored_re = re.compile('|'.join(re.escape(path) for path in paths_ignored))
+        else:
+            self.ignored_re = None
+        self.cached = functools.lru_cache(maxsize=cache_size)(self.canonicalize)
+
+    def __reduce__(self):
+        # Executor processes unpickle the Site for every page, they all get one resolver and keep its memo
+        return shared, (self.base, tuple(self.paths_ignored or ()), self.sort_query, self.cache_size)
+
+    def resolve(self, link, current):
+        # Absolute links do not depend on the page they were found on, so they share cache entries across pages
+        if link.startswith('/') or ':' in link.partition('/')[0]:
+            return self.cached(link, current.netloc, None, None)
+        return self.cached(link, current.netloc, current.path, current.query)
+
+    def canonicalize(self, link, netloc, path, query):
+        url = urllib.parse.urlsplit(link)
+        if url.scheme and url.scheme not in SCHEMES:
+            return None
+        if self.ignored_re is not None and self.ignored_re.search(url.path if url.netloc else link):
+            return None
+        if url.netloc:
+            if canonical_netloc(url.scheme or self.scheme, url.netloc) != canonical_netloc(self.scheme, netloc):
+                return None
+        elif path is not None:
+            # Relative reference, resolved against the current page
+            url = urllib.parse.urlsplit(urllib.parse.urljoin(urllib.parse.urlunsplit(('', '', path or '/', query, '')), link))
+        path = remove_dot_segments(url.path) or '/'
+        query = url.query
+        if self.sort_query and '&' in query:
+            query = '&'.join(sorted(query.split('&')))
+        return urllib.parse.urlunsplit((self.scheme, self.netloc, path, query, ''))
+
+    def cache_info(self):
+        return self.cached.cache_info()
+
+
+@functools.lru_cache(maxsize=64)
+def shared(base, paths_ignored=tuple(), sort_query=True, cache_size=65536):
+    return Resolver(base, paths_ignored, sort_query, cache_size)
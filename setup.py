@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 
-from distutils.core import setup
+from setuptools import setup
 
 import digslash
 
@@ -18,6 +18,17 @@ setup(
         'aiohttp==3.8.3',
         'beautifulsoup4==4.11.1',
     ),
+    extras_require={
+        'speedups': (
+            'uvloop',
+            'xxhash',
+        ),
+    },
+    entry_points={
+        'console_scripts': (
+            'digslash = digslash.cli:main',
+        ),
+    },
     classifiers=[
         'Development Status :: 5 - Production/Stable',
         'Topic :: Utilities',
@@ -0,0 +1,46 @@
+import pathlib
+
+import pytest
+
+from digslash import (
+    nodes,
+    sites,
+)
+
+
+def get_pages():
+    root = pathlib.Path(__file__).parent
+    for website in ('website-1', 'website-2'):
+        for path in sorted((root / website).rglob('*')):
+            if path.suffix in ('.html', '.js'):
+                relative = path.relative_to(root / website).as_posix()
+                yield pytest.param(relative, path.read_bytes(), id='{}/{}'.format(website, relative))
+
+
+@pytest.mark.parametrize('path,content', get_pages())
+def test_backends_parity(path, content):
+    current = 'https://example.com/' + path
+    expected = nodes.Node(sites.Site('https://example.com/'), content, 'utf-8', current=current).process()
+    results = nodes.Node(sites.Site('https://example.com/', parser_backend='html'), content, 'utf-8', current=current).process()
+    assert results == expected
+
+
+def test_backends_parity_edge_cases():
+    content = b"""
+        <A HREF="upper.html">Upper</A>
+        <a href>Empty</a>
+        <a href="first.html" href="second.html">Duplicated</a>
+        <a href="amp.html?a=1&amp;b=2">Entity</a>
+        <script>document.write('<a href="inline.html">')</script>
+        <iframe src="frame.html"/>
+        <form action="post.php"><input src="ignored.png"></form>
+        <!-- <a href="comment.html"> -->
+    """
+    expected = nodes.Node(sites.Site('https://example.com/'), content).process()
+    results = nodes.Node(sites.Site('https://example.com/', parser_backend='html'), content).process()
+    assert results == expected
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        sites.Site('https://example.com/', parser_backend='unknown')
@@ -0,0 +1,70 @@
+from digslash import (
+    caches,
+    nodes,
+    sites,
+)
+
+
+def test_lru_eviction():
+    cache = caches.ParseCache(size=2)
+    cache.put('a', ['/a'])
+    cache.put('b', ['/b'])
+    assert cache.get('a') == ('/a',)
+    cache.put('c', ['/c'])
+    assert cache.get('b') is None
+    assert cache.get('c') == ('/c',)
+    assert cache.info() == {'hits': 2, 'misses': 1, 'ratio': 2 / 3, 'entries': 2}
+
+
+def test_persistent(tmp_path):
+    path = str(tmp_path / 'parses.db')
+    cache = caches.ParseCache(path=path)
+    cache.put('a', ['/a', 'b.html'])
+    cache.close()
+    cache = caches.ParseCache(size=1, path=path)
+    assert cache.get('a') == ('/a', 'b.html')
+    cache.put('b', ['/b'])
+    # Evicted from memory, still on disk
+    assert cache.get('a') == ('/a', 'b.html')
+    cache.close()
+
+
+def test_cached_links_rebased_per_page():
+    site = sites.Site('https://example.com', parse_cache=caches.ParseCache())
+    text = b'<a href="about.html">About</a><a href="/top.html">Top</a>'
+    results = nodes.process(site, text, current='https://example.com/a/index.html')
+    assert results.pop('extracted') in (('about.html', '/top.html'), ('/top.html', 'about.html'))
+    node = nodes.Node(site, text, current='https://example.com/b/index.html', links=('about.html', '/top.html'))
+    results = node.process()
+    assert node.parser is None
+    assert 'extracted' not in results
+    assert results['links'] == {'https://example.com/b/about.html', 'https://example.com/top.html'}
+    assert results['checksum'] == nodes.checksum(text)
+
+
+def test_key_covers_extraction_config(monkeypatch):
+    site = sites.Site('https://example.com', parse_cache=caches.ParseCache())
+    config = site.parse_cache_config()
+    site.parser_backend = 'html'
+    assert site.parse_cache_config() != config
+    site.parser_backend = 'bs4'
+    monkeypatch.setattr(nodes.Node, 'FOLLOWED_ELEMENTS_ATTRS', (('a', 'href'),))
+    assert site.parse_cache_config() != config
+    monkeypatch.undo()
+    assert site.parse_cache_config() == config
+    checksum = nodes.checksum(b'')
+    assert site.parse_cache_key(checksum) == '{} {}'.format(config, checksum)
+
+
+def test_shared_connection_closed_by_last_user(tmp_path):
+    cache = caches.ParseCache(path=str(tmp_path / 'parses.db'))
+    cache.open()
+    cache.open()
+    cache.close()
+    assert cache.connection is not None
+    cache.close()
+    assert cache.connection is None
+    cache.open()
+    assert cache.get('a') is None
+    cache.close()
+    assert cache.connection is None
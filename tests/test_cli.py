@@ -0,0 +1,115 @@
+import functools
+import json
+import pathlib
+import subprocess
+import sys
+import threading
+from http import server
+
+import pytest
+
+from digslash import cli
+
+
+@pytest.fixture
+def website1():
+    web_dir = pathlib.os.path.join(pathlib.os.path.dirname(__file__), 'website-1')
+    httpd = server.HTTPServer(
+        ('127.0.0.1', 8000),
+        functools.partial(server.SimpleHTTPRequestHandler, directory=web_dir)
+    )
+    httpd_thread = threading.Thread(target=httpd.serve_forever)
+    httpd_thread.daemon = True
+    httpd_thread.start()
+    yield 'http://127.0.0.1:8000/'
+    httpd.server_close()
+    httpd.shutdown()
+    httpd_thread.join()
+
+
+def test_site_options():
+    args = cli.parser_create().parse_args([
+        'https://example.com/', '--no-deduplicate', '--workers', '4', '--limit', '0', '--store-links',
+        '--content-types', 'text/html', '--paths-ignored', '--no-sort-query',
+    ])
+    options = cli.site_options(args)
+    assert options['deduplicate'] is False
+    assert options['workers_no'] == 4
+    assert options['limit'] == 0
+    assert options['store_links'] is True
+    assert options['accepted_content_types'] == ['text/html']
+    assert options['paths_ignored'] == []
+    assert options['sort_query'] is False
+    assert 'extractors' not in options
+
+
+def test_seeds_from_file(tmp_path):
+    seeds = tmp_path / 'seeds.txt'
+    seeds.write_text('https://example.com/\n\n# comment\nhttps://example.net/\n')
+    args = cli.parser_create().parse_args(['https://example.org/', '--input', str(seeds)])
+    assert cli.seeds_read(args) == ['https://example.org/', 'https://example.com/', 'https://example.net/']
+
+
+def test_crawl_ndjson(website1, tmp_path):
+    output = tmp_path / 'results.ndjson'
+    assert cli.main([website1, '--output', str(output), '--quiet', '--store-links']) == 0
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert {record['url'] for record in records} == {
+        'http://127.0.0.1:8000/',
+        'http://127.0.0.1:8000/pages/contact.html',
+        'http://127.0.0.1:8000/pages/about.html',
+        'http://127.0.0.1:8000/pages/feedback.html',
+        'http://127.0.0.1:8000/js/script.js',
+        'http://127.0.0.1:8000/scripts/feedback.html',
+    }
+    assert all('links' in record for record in records)
+
+
+def test_invalid_option():
+    with pytest.raises(SystemExit):
+        cli.main(['https://example.com/', '--hash-algorithm', 'crc32', '--quiet'])
+
+
+def test_invalid_previous_keeps_output(tmp_path):
+    output = tmp_path / 'results.ndjson'
+    output.write_text('kept\n')
+    with pytest.raises(SystemExit):
+        cli.main(['https://example.com/', '--output', str(output), '--previous', str(tmp_path / 'missing.ndjson')])
+    assert output.read_text() == 'kept\n'
+
+
+def test_replay_missing_store(tmp_path, capsys):
+    output = tmp_path / 'results.ndjson'
+    with pytest.raises(SystemExit):
+        cli.main(['https://example.com/', '--output', str(output), '--replay', str(tmp_path / 'fetches')])
+    assert 'No fetch store' in capsys.readouterr().err
+    assert not output.exists()
+
+
+def test_crawl_previous(website1, tmp_path):
+    first, second = tmp_path / 'first.ndjson', tmp_path / 'second.ndjson'
+    assert cli.main([website1, '--output', str(first), '--quiet', '--store-links', '--store-content']) == 0
+    args = cli.parser_create().parse_args([website1, '--previous', str(first)])
+    previous = cli.site_options(args)['previous']
+    assert previous[website1]['body'].startswith(b'<')
+    assert cli.main([website1, '--output', str(second), '--quiet', '--store-links', '--previous', str(first)]) == 0
+    first_links, second_links = (
+        {record['url']: record['links'] for record in map(json.loads, path.read_text().splitlines())}
+        for path in (first, second)
+    )
+    assert second_links == first_links
+
+
+def test_lazy_imports():
+    code = 'import sys; from digslash import cli; print(sorted({"aiohttp", "bs4"} & set(sys.modules)))'
+    root = pathlib.Path(__file__).parent.parent
+    output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '[]'
+
+
+def test_record_replay(website1, tmp_path):
+    store = str(tmp_path / 'fetches')
+    recorded, replayed = tmp_path / 'recorded.ndjson', tmp_path / 'replayed.ndjson'
+    assert cli.main([website1, '--output', str(recorded), '--quiet', '--record', store]) == 0
+    assert cli.main([website1, '--output', str(replayed), '--quiet', '--replay', store]) == 0
+    assert sorted(recorded.read_text().splitlines()) == sorted(replayed.read_text().splitlines())
@@ -1,3 +1,6 @@
+import codecs
+import hashlib
+
 import pytest
 
 from digslash import (
@@ -127,3 +130,72 @@ def test_html_no_quotes(site):
             'https://example.com/vendor/jquery/jquery.min.js',
         }
     }
+
+
+def test_html_incremental_feed(site):
+    text = b"""
+        <a href="pages/about.html">About</a>
+        <script src="/vendor/jquery/jquery.min.js"></script>
+        <a href="http://example.net/external.html">External</a>
+        <form action="contact.php"></form>
+    """
+    node = nodes.Node(site, None, current='https://example.com/home.html')
+    assert node.feed(text[:60]) == {'https://example.com/pages/about.html'}
+    assert node.feed(text[60:200]) == {'https://example.com/vendor/jquery/jquery.min.js'}
+    assert node.feed(text[200:]) == {'https://example.com/contact.php'}
+    results = node.close()
+    assert results == nodes.Node(site, text, current='https://example.com/home.html').process()
+
+
+@pytest.mark.parametrize('text', (
+    '<a href="/café.html">Café</a>'.encode('latin-1'),
+    '<a href="/café.html">Café</a>'.encode('utf-8'),
+    b'<a href="/a.html">A</a>' + '<p>caf\u00e9</p>'.encode('utf-8')[:-5],
+))
+def test_html_incremental_undeclared_encoding(site, text):
+    node = nodes.Node(site, None, current='https://example.com/')
+    for start in range(0, len(text), 7):
+        node.feed(text[start:start + 7])
+    assert node.close() == nodes.Node(site, text, current='https://example.com/').process()
+
+
+@pytest.mark.parametrize('algorithm', ('md5', 'sha1', 'blake2b'))
+def test_checksum_algorithms(algorithm):
+    text = b'<a href="pages/about.html">About</a>'
+    site = sites.Site('https://example.com', hash_algorithm=algorithm)
+    results = nodes.Node(site, text).process()
+    assert results['checksum'] == nodes.checksum(text, algorithm)
+    node = nodes.Node(site, None)
+    node.feed(text)
+    assert node.close()['checksum'] == results['checksum']
+
+
+def test_checksum_default_md5(site):
+    text = b'<a href="pages/about.html">About</a>'
+    assert nodes.Node(site, text).process()['checksum'] == hashlib.md5(text).hexdigest()
+
+
+def test_checksum_unknown_algorithm():
+    with pytest.raises(ValueError):
+        sites.Site('https://example.com', hash_algorithm='crc32')
+
+
+@pytest.mark.parametrize('text,declared,expected', (
+    (b'<a href="a.html">A</a>', None, 'ascii'),
+    (b'<a href="a.html">A</a>', 'UTF-8', 'utf-8'),
+    (b'<a href="a.html">A</a>', 'unknown-charset', 'ascii'),
+    (codecs.BOM_UTF8 + b'<a href="a.html">A</a>', 'iso-8859-2', 'utf-8-sig'),
+    (b'<meta charset="iso-8859-2"><a href="a.html">\xb1</a>', None, 'iso-8859-2'),
+    (b'<meta http-equiv="Content-Type" content="text/html; charset=Shift_JIS">', None, 'shift_jis'),
+    ('<a href="a.html">Zażółć</a>'.encode('utf-8'), None, 'utf-8'),
+    ('<a href="a.html">Café</a>'.encode('latin-1'), None, 'windows-1252'),
+))
+def test_encoding_sniffing(site, text, declared, expected):
+    assert nodes.Node(site, text, declared).encoding == expected
+
+
+def test_undeclared_non_ascii_page_is_processed(site):
+    text = '<a href="café.html">Café</a>'.encode('latin-1')
+    node = nodes.Node(site, text)
+    assert node.process()['links'] == {'https://example.com/caf\xe9.html'}
+    assert node.content == text.decode('windows-1252')
@@ -0,0 +1,102 @@
+import asyncio
+import functools
+import multiprocessing
+import pathlib
+import sqlite3
+import threading
+from concurrent import futures
+from http import server
+
+import aiohttp
+import pytest
+
+from digslash import (
+    crawlers,
+    sites,
+)
+
+
+@pytest.fixture
+def websites():
+    servers = list()
+    for port, dirname in ((8000, 'website-1'), (8001, 'website-2')):
+        web_dir = pathlib.os.path.join(pathlib.os.path.dirname(__file__), dirname)
+        httpd = server.HTTPServer(
+            ('127.0.0.1', port),
+            functools.partial(server.SimpleHTTPRequestHandler, directory=web_dir)
+        )
+        httpd_thread = threading.Thread(target=httpd.serve_forever)
+        httpd_thread.daemon = True
+        httpd_thread.start()
+        servers.append((httpd, httpd_thread))
+    yield 'http://127.0.0.1:8000/', 'http://127.0.0.1:8001/'
+    for httpd, httpd_thread in servers:
+        httpd.server_close()
+        httpd.shutdown()
+        httpd_thread.join()
+
+
+def test_crawler_shares_session_and_executor(websites):
+    with futures.ThreadPoolExecutor(max_workers=2) as executor:
+        crawler = crawlers.Crawler([sites.Site(base) for base in websites], concurrency=4, executor=executor)
+        asyncio.run(crawler.crawl())
+    assert crawler.session is None
+    assert crawler.connections['created'] >= 2
+    assert set(crawler.results['http://127.0.0.1:8000/'].keys()) == {
+        'http://127.0.0.1:8000/',
+        'http://127.0.0.1:8000/pages/contact.html',
+        'http://127.0.0.1:8000/pages/about.html',
+        'http://127.0.0.1:8000/pages/feedback.html',
+        'http://127.0.0.1:8000/js/script.js',
+        'http://127.0.0.1:8000/scripts/feedback.html',
+    }
+    assert set(crawler.results['http://127.0.0.1:8001/'].keys()) == {
+        'http://127.0.0.1:8001/',
+        'http://127.0.0.1:8001/page.html',
+        'http://127.0.0.1:8001/page2.html?arg=2',
+        'http://127.0.0.1:8001/code.js',
+    }
+    for site in crawler.sites:
+        assert site.connections['created'] == 0
+
+
+def test_crawler_keeps_site_ssl_context(websites, monkeypatch):
+    contexts = list()
+    request = aiohttp.ClientSession._request
+
+    def request_tracked(session, method, url, **kwargs):
+        contexts.append(kwargs.get('ssl'))
+        return request(session, method, url, **kwargs)
+
+    monkeypatch.setattr(aiohttp.ClientSession, '_request', request_tracked)
+    site = sites.Site(websites[0], verify_ssl=False, limit=1)
+    crawler = crawlers.Crawler([site])
+    asyncio.run(crawler.crawl())
+    assert contexts == [site.ssl_context]
+    assert site.ssl_context is not crawler.ssl_context
+
+
+def test_crawl_partitions(websites, tmp_path):
+    path = str(tmp_path / 'crawl.db')
+    processes = list()
+    for partition in range(2):
+        process = multiprocessing.Process(
+            target=crawlers.crawl_partition,
+            args=('http://127.0.0.1:8000/', path, partition, 2),
+        )
+        process.start()
+        processes.append(process)
+    for process in processes:
+        process.join(30)
+        assert process.exitcode == 0
+    connection = sqlite3.connect(path)
+    assert {url for url, in connection.execute('SELECT url FROM results')} == {
+        'http://127.0.0.1:8000/',
+        'http://127.0.0.1:8000/pages/contact.html',
+        'http://127.0.0.1:8000/pages/about.html',
+        'http://127.0.0.1:8000/pages/feedback.html',
+        'http://127.0.0.1:8000/js/script.js',
+        'http://127.0.0.1:8000/scripts/feedback.html',
+    }
+    assert {partition for partition, in connection.execute('SELECT DISTINCT partition FROM frontier')} == {0, 1}
+    connection.close()
@@ -0,0 +1,208 @@
+import asyncio
+import functools
+import gzip
+import threading
+from http import server
+
+import pytest
+
+from digslash import (
+    extractors,
+    nodes,
+    sites,
+)
+
+
+@pytest.fixture
+def site():
+    site = sites.Site('https://example.com', extractors=extractors.EXTRACTORS)
+    yield site
+
+
+def test_default_site_ignores_extended_attrs():
+    site = sites.Site('https://example.com')
+    text = b'<img src="images/example.png"><meta http-equiv="refresh" content="0; url=/moved.html">'
+    assert nodes.Node(site, text, content_type='text/html').process()['links'] == set()
+
+
+def test_html_extended_attrs(site):
+    text = b"""
+        <img src="images/a.png" srcset="images/a-2x.png 2x, /images/a-3x.png 3x">
+        <picture><source srcset="images/b.webp 1x,images/b-2x.webp 2x"></picture>
+        <video src="media/clip.mp4" poster="media/poster.jpg"></video>
+        <iframe src="/embedded.html"></iframe>
+        <object data="flash/movie.swf"></object>
+        <button formaction="/submit.php">Send</button>
+        <meta http-equiv="Refresh" content="5; URL='/moved.html'">
+    """
+    node = nodes.Node(site, text, current='https://example.com/pages/index.html', content_type='text/html')
+    assert node.process()['links'] == {
+        'https://example.com/embedded.html',
+        'https://example.com/images/a-3x.png',
+        'https://example.com/moved.html',
+        'https://example.com/pages/flash/movie.swf',
+        'https://example.com/pages/images/a-2x.png',
+        'https://example.com/pages/images/a.png',
+        'https://example.com/pages/images/b-2x.webp',
+        'https://example.com/pages/images/b.webp',
+        'https://example.com/pages/media/clip.mp4',
+        'https://example.com/pages/media/poster.jpg',
+        'https://example.com/submit.php',
+    }
+
+
+def test_html_inline_script(site):
+    text = b"""
+        <script src="/app.js"></script>
+        <script>
+            fetch('/api/items?page=1');
+            var config = {"next": "https:\\/\\/example.com\\/feed.json", "other": "//example.net/x.js"};
+            var path = "/";
+        </script>
+        <p>"/not-a-script.html"</p>
+    """
+    node = nodes.Node(site, text, content_type='text/html')
+    assert node.process()['links'] == {
+        'https://example.com/api/items?page=1',
+        'https://example.com/app.js',
+        'https://example.com/feed.json',
+    }
+
+
+@pytest.mark.parametrize('content_type', ('application/javascript', 'application/json'))
+def test_script_links(site, content_type):
+    text = b'{"urls": ["/a.html", "../b.html", "https://example.com/c.html", "https://example.net/d.html", "plain"]}'
+    node = nodes.Node(site, text, current='https://example.com/x/y.js', content_type=content_type)
+    assert node.process()['links'] == {
+        'https://example.com/a.html',
+        'https://example.com/b.html',
+        'https://example.com/c.html',
+    }
+
+
+SITEMAP = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+    <url><loc>https://example.com/one.html</loc></url>
+    <url><loc> https://example.com/two.html?a=1&amp;b=2 </loc></url>
+    <url><loc>https://example.net/three.html</loc></url>
+</urlset>
+"""
+
+
+@pytest.mark.parametrize('content_type,text', (
+    ('application/xml', SITEMAP),
+    ('application/gzip', gzip.compress(SITEMAP)),
+))
+def test_sitemap(site, content_type, text):
+    node = nodes.Node(site, text, content_type=content_type)
+    assert node.process()['links'] == {
+        'https://example.com/one.html',
+        'https://example.com/two.html?a=1&b=2',
+    }
+
+
+def test_sitemap_truncated_gzip(site):
+    text = gzip.compress(SITEMAP)[:-20]
+    node = nodes.Node(site, text, content_type='application/gzip')
+    assert 'https://example.com/one.html' in node.process()['links']
+
+
+def test_robots():
+    text = """
+        User-agent: *
+        Disallow: /private/
+        Disallow: /*.php$
+        Allow: /public/ # comment
+        Disallow:
+        Sitemap: https://example.com/sitemap-index.xml
+    """
+    assert extractors.extract_robots(text) == [
+        '/private/',
+        '/public/',
+        'https://example.com/sitemap-index.xml',
+    ]
+
+
+def test_extractors_extend_accepted_content_types(site):
+    assert 'application/gzip' in site.accepted_content_types
+    assert 'text/html' in sites.Site('https://example.com').accepted_content_types
+    assert 'application/gzip' not in sites.Site('https://example.com').accepted_content_types
+
+
+@pytest.fixture
+def website_robots(tmp_path):
+    (tmp_path / 'index.html').write_text('<a href="page.html">Page</a>')
+    (tmp_path / 'page.html').write_text('<p>Page</p>')
+    (tmp_path / 'hidden.html').write_text('<p>Hidden</p>')
+    (tmp_path / 'orphan.html').write_text('<img srcset="orphan.png 1x">')
+    (tmp_path / 'robots.txt').write_text('User-agent: *\nDisallow: /hidden.html\n')
+    (tmp_path / 'sitemap.xml').write_text(
+        '<urlset><url><loc>http://127.0.0.1:8000/orphan.html</loc></url></urlset>'
+    )
+    httpd = server.HTTPServer(
+        ('127.0.0.1', 8000),
+        functools.partial(server.SimpleHTTPRequestHandler, directory=str(tmp_path))
+    )
+    httpd_thread = threading.Thread(target=httpd.serve_forever)
+    httpd_thread.daemon = True
+    httpd_thread.start()
+    yield
+    httpd.server_close()
+    httpd.shutdown()
+    httpd_thread.join()
+
+
+def test_seed_robots(website_robots):
+    site = sites.Site('http://127.0.0.1:8000/', extractors=extractors.EXTRACTORS, seed_robots=True)
+    asyncio.run(site.crawl())
+    assert set(site.results) == {
+        'http://127.0.0.1:8000/',
+        'http://127.0.0.1:8000/hidden.html',
+        'http://127.0.0.1:8000/orphan.html',
+        'http://127.0.0.1:8000/orphan.png',
+        'http://127.0.0.1:8000/page.html',
+        'http://127.0.0.1:8000/sitemap.xml',
+    }
+
+
+def test_seed_robots_bogus_charset():
+    site = sites.Site('https://example.com/', seed_robots=True, limit=0)
+    fetched = list()
+
+    async def fetch(url, on_chunk=None, previous=None):
+        fetched.append(url)
+        if url == 'https://example.com/robots.txt':
+            return b'Sitemap: https://example.com/pages.xml\n', 'bogus', 'text/plain', dict()
+
+    site.fetch = fetch
+    asyncio.run(site.crawl())
+    assert 'https://example.com/pages.xml' in fetched
+
+
+def test_failed_seeding_stops_workers():
+    site = sites.Site('https://example.com/', seed_robots=True)
+
+    async def fetch(url, on_chunk=None, previous=None):
+        raise RuntimeError(url)
+
+    site.fetch = fetch
+    with pytest.raises(RuntimeError):
+        asyncio.run(site.crawl())
+    assert site.workers == []
+    assert site.session is None
+
+
+def test_incremental_uses_extractors():
+    site = sites.Site('https://example.com/', extractors=extractors.EXTRACTORS, incremental=True, limit=1, store_links=True)
+    body = b'fetch("/api/items.json"); import("/static/app.js");'
+
+    async def fetch(url, on_chunk=None, previous=None):
+        on_chunk(body, 'utf-8', 'application/javascript')
+        return body, 'utf-8', 'application/javascript', dict()
+
+    site.fetch = fetch
+    asyncio.run(site.crawl())
+    assert site.results['https://example.com/']['links'] == [
+        'https://example.com/api/items.json',
+        'https://example.com/static/app.js',
+    ]
@@ -0,0 +1,101 @@
+import asyncio
+import random
+
+from digslash import (
+    fingerprints,
+    nodes,
+    sites,
+)
+
+
+PAGE = '''
+    <html><body>
+    <h1>Products</h1>
+    <form action="/cart" method="POST"><input type="hidden" name="csrf" value="{token}"></form>
+    <p>{text}</p>
+    <a href="/products/1">First</a><a href="/products/2">Second</a>
+    </body></html>
+'''
+
+
+def make_page(token, seed=0):
+    words = random.Random(seed).choices(['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta', 'theta'], k=300)
+    return PAGE.format(token=token, text=' '.join(words)).encode()
+
+
+def test_simhash_near_duplicates():
+    first = fingerprints.simhash(fingerprints.shingles(make_page('8f14e45fceea167a').decode()))
+    second = fingerprints.simhash(fingerprints.shingles(make_page('c9f0f895fb98ab91').decode()))
+    other = fingerprints.simhash(fingerprints.shingles(make_page('c9f0f895fb98ab91', seed=1).decode()))
+    assert fingerprints.distance(first, second) <= 6
+    assert fingerprints.distance(first, other) > 6
+
+
+def test_simhash_index():
+    index = fingerprints.SimHashIndex(distance=3)
+    index.add(0b1011 << 40, 'first')
+    assert index.lookup(0b1011 << 40) == 'first'
+    assert index.lookup((0b1011 << 40) ^ 0b111) == 'first'
+    assert index.lookup((0b1011 << 40) ^ 0b1111) is None
+    assert len(index) == 1
+
+
+def test_near_duplicates_not_expanded():
+    site = sites.Site('https://example.com/', near_duplicates_distance=6)
+    expanded = list()
+    for i, token in enumerate(('8f14e45fceea167a', 'c9f0f895fb98ab91')):
+        url = 'https://example.com/products?page={}'.format(i)
+        results = nodes.Node(site, make_page(token), current=url).process()
+        expanded.append(site.done(url, '', results, None, None))
+    assert expanded == [True, False]
+    assert site.results['https://example.com/products?page=1']['near_duplicate_of'] == 'https://example.com/products?page=0'
+
+
+TEMPLATE = '''
+    <html><head><style>.menu {{ display: flex; }}</style><script>var menu = "{menu}";</script></head><body>
+    <nav><ul>{menu}</ul></nav>
+    <article><p>{text}</p></article>
+    </body></html>
+'''
+
+
+def make_article(seed):
+    menu = ''.join(
+        '<li class="menu-item"><a class="menu-link" href="/section/{0}/">{0}</a></li>'.format(i) for i in range(300)
+    )
+    words = random.Random(seed).choices(['word{}'.format(i) for i in range(2000)], k=80)
+    return TEMPLATE.format(menu=menu, text=' '.join(words)).encode()
+
+
+def test_shared_template_not_near_duplicates():
+    site = sites.Site('https://example.com/', near_duplicates_distance=6)
+    first = nodes.Node(site, make_article(0)).process()['simhash']
+    second = nodes.Node(site, make_article(1)).process()['simhash']
+    assert fingerprints.distance(first, second) > 6
+
+
+def test_incremental_near_duplicates_not_expanded():
+    site = sites.Site('https://example.com/', near_duplicates_distance=6, incremental=True, limit=0)
+    pages = {
+        'https://example.com/': b'<a href="/a">A</a><a href="/b">B</a>',
+        'https://example.com/a': make_page('8f14e45fceea167a') + b'<a href="/only-a">Only A</a>',
+        'https://example.com/b': make_page('c9f0f895fb98ab91') + b'<a href="/only-b">Only B</a>',
+    }
+
+    async def fetch(url, on_chunk=None, previous=None):
+        body = pages.get(url, url.encode())
+        on_chunk(body)
+        return body, None, 'text/html', dict()
+
+    site.fetch = fetch
+    asyncio.run(site.crawl())
+    only = {
+        'https://example.com/a': 'https://example.com/only-a',
+        'https://example.com/b': 'https://example.com/only-b',
+    }
+    near_duplicates = [url for url in only if 'near_duplicate_of' in site.results[url]]
+    assert len(near_duplicates) == 1
+    original = site.results[near_duplicates[0]]['near_duplicate_of']
+    # Links streamed from the near duplicate were held back
+    assert only[original] in site.results
+    assert only[near_duplicates[0]] not in site.results
@@ -0,0 +1,145 @@
+import asyncio
+
+from digslash import (
+    frontiers,
+    sites,
+)
+
+
+def test_frontier_skips_queued_and_in_flight():
+
+    async def run():
+        site = sites.Site('https://example.com/')
+        site.queue = frontiers.Frontier()
+        site.queue_add(['https://example.com/a', 'https://example.com/b'])
+        site.queue_add(['https://example.com/a'])
+        assert site.queue.qsize() == 2
+        url, source = await site.queue.get()
+        site.queue_add([url])
+        assert site.queue.qsize() == 1
+        site.queue.task_done()
+        site.queue_add([url, 'https://example.com/c'], url)
+        assert site.queue.qsize() == 2
+        assert len(site.queue) == 3
+
+    asyncio.run(run())
+
+
+def drain(frontier):
+    urls = list()
+    while not frontier.empty():
+        url, source = frontier.get_nowait()
+        urls.append(url)
+        frontier.done(url)
+    return urls
+
+
+def test_priority_frontier_breadth_first():
+
+    async def run():
+        frontier = frontiers.PriorityFrontier()
+        frontier.put_nowait(('https://example.com/', None))
+        assert await frontier.get() == ('https://example.com/', None)
+        frontier.put_nowait(('https://example.com/a', 'https://example.com/'))
+        frontier.put_nowait(('https://example.com/a/1', 'https://example.com/a'))
+        frontier.put_nowait(('https://example.com/b', 'https://example.com/'))
+        frontier.done('https://example.com/')
+        assert frontier.depth('https://example.com/a/1') == 2
+        assert drain(frontier) == ['https://example.com/a', 'https://example.com/b', 'https://example.com/a/1']
+
+    asyncio.run(run())
+
+
+def test_priority_frontier_limits():
+
+    async def run():
+        frontier = frontiers.PriorityFrontier(max_depth=1, prefix_limit=2)
+        frontier.put_nowait(('https://example.com/', None))
+        for i in range(5):
+            frontier.put_nowait(('https://example.com/list/{}'.format(i), 'https://example.com/'))
+        frontier.put_nowait(('https://example.com/about', 'https://example.com/'))
+        frontier.put_nowait(('https://example.com/deep', 'https://example.com/about'))
+        assert frontier.dropped == 4
+        assert 'https://example.com/list/4' not in frontier
+        assert drain(frontier) == [
+            'https://example.com/',
+            'https://example.com/list/0',
+            'https://example.com/list/1',
+            'https://example.com/about',
+        ]
+
+    asyncio.run(run())
+
+
+def test_priority_frontier_retry_keeps_depth():
+
+    async def run():
+        frontier = frontiers.PriorityFrontier(prefix_limit=1)
+        frontier.put_nowait(('https://example.com/a', None))
+        url, source = frontier.get_nowait()
+        frontier.retry(url, source)
+        assert frontier.qsize() == 1
+        assert frontier.dropped == 0
+
+    asyncio.run(run())
+
+
+def test_priority_frontier_scores():
+
+    async def run():
+        frontier = frontiers.PriorityFrontier(score=frontiers.novelty)
+        for url in ('/blog/1', '/blog/2', '/blog/3', '/docs/1', '/shop/1'):
+            frontier.put_nowait(('https://example.com' + url, None))
+        assert drain(frontier)[:3] == ['https://example.com/blog/1', 'https://example.com/docs/1', 'https://example.com/shop/1']
+        frontier = frontiers.PriorityFrontier(score=frontiers.pages_first)
+        for url in ('/style.css', '/logo.png', '/about.html', '/contact'):
+            frontier.put_nowait(('https://example.com' + url, None))
+        assert drain(frontier) == [
+            'https://example.com/about.html',
+            'https://example.com/contact',
+            'https://example.com/style.css',
+            'https://example.com/logo.png',
+        ]
+
+    asyncio.run(run())
+
+
+def test_sqlite_frontier_claims_expire(tmp_path):
+    path = str(tmp_path / 'frontier.db')
+    crashed = frontiers.SQLiteFrontier(path, lease=0.2)
+    crashed.put_nowait(('https://example.com/', ''))
+    assert crashed.get_nowait() == ('https://example.com/', '')
+    # Gone without marking the URL as done
+    crashed.close()
+    frontier = frontiers.SQLiteFrontier(path, lease=0.2)
+    assert frontier.claim() is None
+    assert not frontier.empty()
+
+    async def run():
+        url, source = await asyncio.wait_for(frontier.get(), 2)
+        frontier.done(url)
+        await asyncio.wait_for(frontier.join(), 2)
+        return url
+
+    assert asyncio.run(run()) == 'https://example.com/'
+    frontier.close()
+
+
+def test_sqlite_frontier_live_claims_renewed(tmp_path):
+    path = str(tmp_path / 'frontier.db')
+    frontier = frontiers.SQLiteFrontier(path, lease=0.2)
+    other = frontiers.SQLiteFrontier(path, lease=0.2)
+    frontier.put_nowait(('https://example.com/', ''))
+
+    async def run():
+        url, source = await frontier.get()
+        join = asyncio.create_task(frontier.join())
+        await asyncio.sleep(0.5)
+        stolen = other.claim()
+        frontier.done(url)
+        await asyncio.wait_for(join, 2)
+        return stolen
+
+    assert asyncio.run(run()) is None
+    frontier.close()
+    other.close()
@@ -0,0 +1,93 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from digslash import (
+    frontiers,
+    records,
+)
+
+
+@pytest.fixture
+def table():
+    yield records.URLTable()
+
+
+def test_url_table(table):
+    assert table.id('https://example.com/') == 0
+    assert table.id('https://example.com/a') == 1
+    assert table.id('https://example.com/') == 0
+    assert table[1] == 'https://example.com/a'
+    assert table.get('https://example.com/b') is None
+    assert len(table) == 2
+
+
+def test_results_view(table):
+    results = records.Results(table)
+    entry = {
+        'source': 'https://example.com/',
+        'encoding': 'utf-8',
+        'checksum': hashlib.md5(b'a').hexdigest(),
+        'near_duplicate_of': 'https://example.com/b',
+        'body': b'a',
+    }
+    results['https://example.com/a'] = entry
+    results['https://example.com/'] = {'source': '', 'encoding': 'ascii', 'checksum': hashlib.md5(b'').hexdigest()}
+    assert results['https://example.com/a'] == entry
+    assert results['https://example.com/']['source'] == ''
+    assert list(results) == ['https://example.com/a', 'https://example.com/']
+    assert len(results) == 2
+    assert 'https://example.com/b' not in results
+    with pytest.raises(KeyError):
+        results['https://example.com/b']
+    results['https://example.com/a'] = entry
+    assert len(results) == 2
+    del results['https://example.com/a']
+    assert dict(results) == {
+        'https://example.com/': {'source': '', 'encoding': 'ascii', 'checksum': hashlib.md5(b'').hexdigest()},
+    }
+
+
+def test_digest_index(table):
+    index = records.DigestIndex(table, capacity=4)
+    checksums = [hashlib.md5(str(i).encode()).hexdigest() for i in range(100)]
+    for i, checksum in enumerate(checksums):
+        assert index.setdefault(checksum, 'https://example.com/{}'.format(i)) == 'https://example.com/{}'.format(i)
+    assert index.setdefault(checksums[7], 'https://example.com/other') == 'https://example.com/7'
+    assert len(index) == 100
+    assert index.capacity >= 128
+    assert checksums[42] in index
+    assert hashlib.md5(b'missing').hexdigest() not in index
+    index[checksums[3]] = 'https://example.com/replaced'
+    assert index[checksums[3]] == 'https://example.com/replaced'
+    assert len(index) == 100
+    with pytest.raises(ValueError):
+        index.setdefault(hashlib.sha1(b'a').hexdigest(), 'https://example.com/')
+
+
+def test_compact_frontier(table):
+
+    async def run():
+        frontier = frontiers.CompactFrontier(table)
+        frontier.put_nowait(('https://example.com/', ''))
+        frontier.put_nowait(('https://example.com/a', 'https://example.com/'))
+        assert 'https://example.com/a' in frontier
+        assert 'https://example.com/b' not in frontier
+        assert len(frontier) == 2
+        assert await frontier.get() == ('https://example.com/', '')
+        assert frontier.get_nowait() == ('https://example.com/a', 'https://example.com/')
+        frontier.retry('https://example.com/a', 'https://example.com/')
+        assert frontier.get_nowait() == ('https://example.com/a', 'https://example.com/')
+        frontier.seen.add('https://example.com/c')
+        assert 'https://example.com/c' in frontier
+
+    asyncio.run(run())
+
+
+def test_results_foreign_checksum(table):
+    results = records.Results(table)
+    results['https://example.com/'] = {'source': '', 'encoding': 'ascii', 'checksum': None}
+    results['https://example.com/a'] = {'source': '', 'encoding': 'ascii', 'checksum': hashlib.sha1(b'').hexdigest()}
+    assert results['https://example.com/']['checksum'] is None
+    assert results['https://example.com/a']['checksum'] == hashlib.sha1(b'').hexdigest()
@@ -0,0 +1,111 @@
+import asyncio
+import functools
+import os
+import pathlib
+import threading
+from http import server
+
+import pytest
+
+from digslash import (
+    replays,
+    sites,
+)
+
+
+@pytest.fixture
+def website2():
+    web_dir = pathlib.os.path.join(pathlib.os.path.dirname(__file__), 'website-2')
+    httpd = server.HTTPServer(
+        ('127.0.0.1', 8000),
+        functools.partial(server.SimpleHTTPRequestHandler, directory=web_dir)
+    )
+    httpd_thread = threading.Thread(target=httpd.serve_forever)
+    httpd_thread.daemon = True
+    httpd_thread.start()
+    yield 'http://127.0.0.1:8000/'
+    httpd.server_close()
+    httpd.shutdown()
+    httpd_thread.join()
+
+
+def record(base, path, **options):
+    store = replays.FetchStore(path, 'record')
+    site = sites.Site(base, fetch_store=store, **options)
+    asyncio.run(site.crawl())
+    store.close()
+    return site
+
+
+def replay(base, path, **options):
+    store = replays.FetchStore(path, 'replay')
+    site = sites.Site(base, fetch_store=store, **options)
+    asyncio.run(site.crawl())
+    store.close()
+    return site
+
+
+def test_store_roundtrip(tmp_path):
+    path = str(tmp_path / 'fetches')
+    store = replays.FetchStore(path, 'record')
+    store.record('https://example.com/', 200, 'text/html', 'utf-8', {'ETag': '"1"'}, b'<a href="a.html">\n</a>')
+    store.record('https://example.com/image.png', 200, 'image/png', None, dict())
+    store.record('https://example.com/', 200, 'text/html', 'utf-8', dict(), b'second')
+    store.close()
+    store = replays.FetchStore(path)
+    assert len(store) == 2
+    response = store.get('https://example.com/')
+    assert (response.status, response.body, response.headers) == (200, b'second', dict())
+    assert store.get('https://example.com/image.png').body is None
+    assert store.get('https://example.com/missing') is None
+    store.close()
+
+
+def test_store_recovers_without_index(tmp_path):
+    path = str(tmp_path / 'fetches')
+    store = replays.FetchStore(path, 'record')
+    store.record('https://example.com/', 200, 'text/html', None, dict(), b'one')
+    store.record('https://example.com/a', 200, 'text/html', None, dict(), b'two')
+    store.close()
+    os.remove(path + '.idx')
+    with open(path, 'ab') as fil:
+        fil.write(b'{"url": "https://example.com/b", "length": 100}\npartial')
+    store = replays.FetchStore(path, 'record')
+    store.record('https://example.com/c', 200, 'text/html', None, dict(), b'three')
+    store.close()
+    store = replays.FetchStore(path)
+    assert sorted(store.offsets) == ['https://example.com/', 'https://example.com/a', 'https://example.com/c']
+    assert store.get('https://example.com/c').body == b'three'
+    store.close()
+
+
+def test_unknown_mode(tmp_path):
+    with pytest.raises(ValueError):
+        replays.FetchStore(str(tmp_path / 'fetches'), 'write')
+
+
+def test_replay_missing_store(tmp_path):
+    with pytest.raises(FileNotFoundError, match='No fetch store'):
+        replays.FetchStore(str(tmp_path / 'fetches'), 'replay')
+    assert not (tmp_path / 'fetches.idx').exists()
+
+
+def test_record_and_replay(website2, tmp_path):
+    path = str(tmp_path / 'fetches')
+    recorded = record(website2, path, store_content=True)
+    # No server behind this base, every response comes from the store
+    replayed = replay(website2.replace('8000', '8009'), path, store_content=True)
+    assert dict(replayed.results) == {}
+    replayed = replay(website2, path, store_content=True)
+    assert dict(replayed.results) == dict(recorded.results)
+
+
+def test_replay_reanalysis(website2, tmp_path):
+    path = str(tmp_path / 'fetches')
+    recorded = record(website2, path)
+    narrowed = replay(website2, path, accepted_content_types=('text/html',))
+    assert set(narrowed.results) < set(recorded.results)
+    assert 'http://127.0.0.1:8000/code.js' in recorded.results
+    assert 'http://127.0.0.1:8000/code.js' not in narrowed.results
+    incremental = replay(website2, path, incremental=True, body_limit=0)
+    assert set(incremental.results) == set(recorded.results)
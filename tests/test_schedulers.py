@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+from digslash import schedulers
+
+
+def test_rate_limit():
+
+    async def run():
+        scheduler = schedulers.Scheduler(rate=50, burst=1)
+        started = time.monotonic()
+        for _ in range(6):
+            host = await scheduler.acquire('http://127.0.0.1:8000/')
+            await scheduler.release(host)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.09
+
+
+def test_concurrency_limit():
+
+    async def run():
+        scheduler = schedulers.Scheduler(concurrency=2)
+        active = list()
+
+        async def request():
+            host = await scheduler.acquire('http://127.0.0.1:8000/')
+            active.append(host.active)
+            await asyncio.sleep(0.01)
+            await scheduler.release(host)
+
+        await asyncio.gather(*(request() for _ in range(8)))
+        return max(active)
+
+    assert asyncio.run(run()) == 2
+
+
+def test_retry_after():
+
+    async def run():
+        scheduler = schedulers.Scheduler(concurrency=8)
+        host = await scheduler.acquire('http://127.0.0.1:8000/')
+        assert scheduler.feedback(host, 429, 0.1, '1')
+        await scheduler.release(host)
+        assert host.concurrency == 4
+        assert 0.9 < host.blocked_until - time.monotonic() <= 1
+        assert not scheduler.feedback(host, 200, 0.1)
+
+    asyncio.run(run())
+
+
+def test_adaptive_concurrency():
+    scheduler = schedulers.Scheduler(concurrency=4, latency_target=1.0)
+    host = scheduler.host('http://127.0.0.1:8000/')
+    scheduler.feedback(host, 200, 5.0)
+    assert host.concurrency == 2
+    scheduler.feedback(host, 200, 5.0)
+    scheduler.feedback(host, 200, 5.0)
+    assert host.concurrency == 1
+    for _ in range(100):
+        scheduler.feedback(host, 200, 0.1)
+    assert host.concurrency == 4
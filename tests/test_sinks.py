@@ -0,0 +1,82 @@
+import asyncio
+import base64
+import functools
+import gzip
+import json
+import pathlib
+import sqlite3
+import threading
+from http import server
+
+import pytest
+
+from digslash import (
+    sinks,
+    sites,
+)
+
+
+@pytest.fixture
+def website2():
+    web_dir = pathlib.os.path.join(pathlib.os.path.dirname(__file__), 'website-2')
+    httpd = server.HTTPServer(
+        ('127.0.0.1', 8000),
+        functools.partial(server.SimpleHTTPRequestHandler, directory=web_dir)
+    )
+    httpd_thread = threading.Thread(target=httpd.serve_forever)
+    httpd_thread.daemon = True
+    httpd_thread.start()
+    yield 'http://127.0.0.1:8000/'
+    httpd.server_close()
+    httpd.shutdown()
+    httpd_thread.join()
+
+
+def test_sinks(website2, tmp_path):
+    site = sites.Site(website2, store_content=True, store_headers=True, sinks=(
+        sinks.NDJSONSink(tmp_path / 'results.ndjson'),
+        sinks.GzipNDJSONSink(tmp_path / 'results.ndjson.gz'),
+        sinks.SQLiteSink(tmp_path / 'results.db'),
+        sinks.ContentStore(tmp_path / 'bodies'),
+    ))
+    asyncio.run(site.crawl())
+    assert len(site.results) == 4
+    for entry in site.results.values():
+        assert set(entry.keys()) == {'source', 'encoding', 'checksum'}
+
+    with open(tmp_path / 'results.ndjson') as handle:
+        records = [json.loads(line) for line in handle]
+    with gzip.open(tmp_path / 'results.ndjson.gz', 'rt') as handle:
+        assert [json.loads(line) for line in handle] == records
+    assert {record['url'] for record in records} == set(site.results.keys())
+    for record in records:
+        assert 'headers' in record
+        body = base64.b64decode(record['body'])
+        assert (tmp_path / 'bodies' / record['checksum'][:2] / record['checksum']).read_bytes() == body
+
+    connection = sqlite3.connect(tmp_path / 'results.db')
+    assert {url for url, in connection.execute('SELECT url FROM results')} == set(site.results.keys())
+    connection.close()
+
+
+def test_content_store_alone_keeps_full_entries(website2, tmp_path):
+    site = sites.Site(website2, store_content=True, store_headers=True, sinks=[sinks.ContentStore(tmp_path)])
+    asyncio.run(site.crawl())
+    for entry in site.results.values():
+        assert 'headers' in entry
+        assert (tmp_path / entry['checksum'][:2] / entry['checksum']).read_bytes() == entry['body']
+    assert not list(tmp_path.glob('*/*.tmp'))
+
+
+def test_iter_results(website2):
+    site = sites.Site(website2)
+
+    async def run():
+        crawl = asyncio.create_task(site.crawl())
+        streamed = dict()
+        async for url, entry in site.iter_results():
+            streamed[url] = entry
+        await crawl
+        return streamed
+
+    assert asyncio.run(run()) == site.results
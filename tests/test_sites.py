@@ -1,12 +1,22 @@
 import asyncio
 import functools
+import gzip
+import json
 import pathlib
 import threading
+from concurrent import futures
 from http import server
 
 import pytest
 
-from digslash import sites
+from digslash import (
+    caches,
+    frontiers,
+    records,
+    schedulers,
+    sites,
+    stats,
+)
 
 
 def get_dir(dirname):
@@ -157,13 +167,13 @@ def test_site_response_body_in_results(website2_with_body):
         },
         'http://127.0.0.1:8000/page.html': {
             'source': 'http://127.0.0.1:8000/',
-            'encoding': 'latin_1',
+            'encoding': 'iso-8859-1',
             'checksum': 'f8f1acd16e78bf0b9b13cd90567c68c2',
             'body': b'<!DOCTYPE html>\n<html>\n<head>\n    <meta charset="iso-8859-1">\n    <meta name="viewport" content="width=device-width, initial-scale=1">\n    <title>Website - Page</title>\n    <link rel="stylesheet" type="text/css" href="style.css">\n</head>\n<body>\n    Test!\n    <script type="text/javascript" src="code.js"></script>\n    <a href="#1a7273747da4797577">Ignore</a>\n    <a href="page2.html#1a7273747da4797577">Ignore</a>\n    <a href="?arg=2">Follow</a>\n    <a href="page2.html?arg=2">Follow</a>\n    <a href="\\\'https:/example.com/\\\'">Ignore</a>\n    <a href="page2.html\\\'https:/example.com/\\\'">Ignore</a>\n    <a href="\' + SOMETHING + \'">Ignore</a>\n    <a href="page2.html\' + SOMETHING + \'">Ignore</a>\n</body>\n</html>'
         },
         'http://127.0.0.1:8000/page2.html?arg=2': {
             'source': 'http://127.0.0.1:8000/page.html',
-            'encoding': 'latin_1',
+            'encoding': 'iso-8859-1',
             'checksum': '1e9b0ff7d25ad34037f3f8bd5b92b434',
             'body': b'<!DOCTYPE html>\n<html>\n<head>\n    <meta charset="iso-8859-1">\n    <meta name="viewport" content="width=device-width, initial-scale=1">\n    <title>Website - Page 2</title>\n    <link rel="stylesheet" type="text/css" href="style.css">\n</head>\n<body>\n    Test 2!\n</body>\n</html>'
         },
@@ -187,19 +197,19 @@ def test_site_response_body_in_results_with_duplicates(website2_with_body_with_d
         },
         'http://127.0.0.1:8000/page.html': {
             'source': 'http://127.0.0.1:8000/',
-            'encoding': 'latin_1',
+            'encoding': 'iso-8859-1',
             'checksum': 'f8f1acd16e78bf0b9b13cd90567c68c2',
             'body': b'<!DOCTYPE html>\n<html>\n<head>\n    <meta charset="iso-8859-1">\n    <meta name="viewport" content="width=device-width, initial-scale=1">\n    <title>Website - Page</title>\n    <link rel="stylesheet" type="text/css" href="style.css">\n</head>\n<body>\n    Test!\n    <script type="text/javascript" src="code.js"></script>\n    <a href="#1a7273747da4797577">Ignore</a>\n    <a href="page2.html#1a7273747da4797577">Ignore</a>\n    <a href="?arg=2">Follow</a>\n    <a href="page2.html?arg=2">Follow</a>\n    <a href="\\\'https:/example.com/\\\'">Ignore</a>\n    <a href="page2.html\\\'https:/example.com/\\\'">Ignore</a>\n    <a href="\' + SOMETHING + \'">Ignore</a>\n    <a href="page2.html\' + SOMETHING + \'">Ignore</a>\n</body>\n</html>'
         },
         'http://127.0.0.1:8000/page.html?arg=2': {
             'source': 'http://127.0.0.1:8000/page.html',
-            'encoding': 'latin_1',
+            'encoding': 'iso-8859-1',
             'checksum': 'f8f1acd16e78bf0b9b13cd90567c68c2',
             'body': b'<!DOCTYPE html>\n<html>\n<head>\n    <meta charset="iso-8859-1">\n    <meta name="viewport" content="width=device-width, initial-scale=1">\n    <title>Website - Page</title>\n    <link rel="stylesheet" type="text/css" href="style.css">\n</head>\n<body>\n    Test!\n    <script type="text/javascript" src="code.js"></script>\n    <a href="#1a7273747da4797577">Ignore</a>\n    <a href="page2.html#1a7273747da4797577">Ignore</a>\n    <a href="?arg=2">Follow</a>\n    <a href="page2.html?arg=2">Follow</a>\n    <a href="\\\'https:/example.com/\\\'">Ignore</a>\n    <a href="page2.html\\\'https:/example.com/\\\'">Ignore</a>\n    <a href="\' + SOMETHING + \'">Ignore</a>\n    <a href="page2.html\' + SOMETHING + \'">Ignore</a>\n</body>\n</html>'
         },
         'http://127.0.0.1:8000/page2.html?arg=2': {
             'source': 'http://127.0.0.1:8000/page.html',
-            'encoding': 'latin_1',
+            'encoding': 'iso-8859-1',
             'checksum': '1e9b0ff7d25ad34037f3f8bd5b92b434',
             'body': b'<!DOCTYPE html>\n<html>\n<head>\n    <meta charset="iso-8859-1">\n    <meta name="viewport" content="width=device-width, initial-scale=1">\n    <title>Website - Page 2</title>\n    <link rel="stylesheet" type="text/css" href="style.css">\n</head>\n<body>\n    Test 2!\n</body>\n</html>'
         },
@@ -216,3 +226,383 @@ def test_site_response_headers_in_results(website2_with_headers):
     asyncio.run(website2_with_headers.crawl())
     for result in website2_with_headers.results.values():
         assert 'headers' in result
+
+
+def test_connections_reused():
+    web_dir = get_dir('website-1')
+
+    class KeepAliveHandler(server.SimpleHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+    httpd = server.ThreadingHTTPServer(
+        ('127.0.0.1', 8000),
+        functools.partial(KeepAliveHandler, directory=web_dir)
+    )
+    httpd_thread = threading.Thread(target=httpd.serve_forever)
+    httpd_thread.daemon = True
+    httpd_thread.start()
+    site = sites.Site('http://127.0.0.1:8000/', connections_limit_per_host=2)
+    asyncio.run(site.crawl())
+    httpd.server_close()
+    httpd.shutdown()
+    httpd_thread.join()
+    assert site.session is None
+    assert 1 <= site.connections['created'] <= 2
+    assert site.connections['reused'] >= 1
+
+
+@pytest.mark.parametrize('executor_class', (
+    futures.ThreadPoolExecutor,
+    futures.ProcessPoolExecutor,
+))
+def test_parse_in_executor(website1, executor_class):
+    with executor_class(max_workers=2) as executor:
+        website1.executor = executor
+        asyncio.run(website1.crawl())
+    assert set(website1.results.keys()) == {
+        'http://127.0.0.1:8000/',
+        'http://127.0.0.1:8000/pages/contact.html',
+        'http://127.0.0.1:8000/pages/about.html',
+        'http://127.0.0.1:8000/pages/feedback.html',
+        'http://127.0.0.1:8000/js/script.js',
+        'http://127.0.0.1:8000/scripts/feedback.html',
+    }
+
+
+def test_site_response_body_limit(website2_with_body):
+    website2_with_body.body_limit = 64
+    asyncio.run(website2_with_body.crawl())
+    # The truncated index page no longer contains any links
+    assert set(website2_with_body.results.keys()) == {
+        'http://127.0.0.1:8000/',
+    }
+    assert website2_with_body.results['http://127.0.0.1:8000/']['body'] == (
+        b'<!DOCTYPE html>\n<html>\n<head>\n    <meta charset="utf-8">\n    <me'
+    )
+
+
+def test_gzip_body_not_cut_to_content_length():
+    page = ''.join('<a href="/{}.html">{}</a>'.format(i, i) for i in range(300)).encode()
+
+    class GzipHandler(server.BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            body = gzip.compress(page)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = server.HTTPServer(('127.0.0.1', 0), GzipHandler)
+    httpd_thread = threading.Thread(target=httpd.serve_forever)
+    httpd_thread.daemon = True
+    httpd_thread.start()
+    base = 'http://127.0.0.1:{}/'.format(httpd.server_address[1])
+    site = sites.Site(base, limit=1, store_content=True, store_links=True)
+    asyncio.run(site.crawl())
+    httpd.server_close()
+    httpd.shutdown()
+    httpd_thread.join()
+    assert site.results[base]['body'] == page
+    assert len(site.results[base]['links']) == 300
+
+
+@pytest.mark.parametrize('body_limit,expected', ((0, 2300), (None, 2300), (64, 64)))
+def test_chunked_body_limit(body_limit, expected):
+    page = b'<p>' + b'x' * 2293 + b'</p>'
+
+    class ChunkedHandler(server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for start in range(0, len(page), 1000):
+                chunk = page[start:start + 1000]
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+
+        def log_message(self, *args):
+            pass
+
+    httpd = server.HTTPServer(('127.0.0.1', 0), ChunkedHandler)
+    httpd_thread = threading.Thread(target=httpd.serve_forever)
+    httpd_thread.daemon = True
+    httpd_thread.start()
+    base = 'http://127.0.0.1:{}/'.format(httpd.server_address[1])
+    site = sites.Site(base, limit=1, store_content=True, body_limit=body_limit)
+    asyncio.run(site.crawl())
+    httpd.server_close()
+    httpd.shutdown()
+    httpd_thread.join()
+    assert site.results[base]['body'] == page[:expected]
+
+
+@pytest.mark.parametrize('incremental', (False, True))
+def test_header_charset(incremental):
+    page = '<p>Zażółć gęślą jaźń</p><a href="/ść.html">Link</a>'.encode('iso-8859-2')
+
+    class CharsetHandler(server.BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=iso-8859-2')
+            self.send_header('Content-Length', str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = server.HTTPServer(('127.0.0.1', 0), CharsetHandler)
+    httpd_thread = threading.Thread(target=httpd.serve_forever)
+    httpd_thread.daemon = True
+    httpd_thread.start()
+    base = 'http://127.0.0.1:{}/'.format(httpd.server_address[1])
+    site = sites.Site(base, limit=1, store_links=True, incremental=incremental)
+    asyncio.run(site.crawl())
+    httpd.server_close()
+    httpd.shutdown()
+    httpd_thread.join()
+    assert site.results[base]['encoding'] == 'iso-8859-2'
+    assert site.results[base]['links'] == [base + 'ść.html']
+
+
+def test_incremental_extraction(website1):
+    website1.incremental = True
+    asyncio.run(website1.crawl())
+    assert set(website1.results.keys()) == {
+        'http://127.0.0.1:8000/',
+        'http://127.0.0.1:8000/pages/contact.html',
+        'http://127.0.0.1:8000/pages/about.html',
+        'http://127.0.0.1:8000/pages/feedback.html',
+        'http://127.0.0.1:8000/js/script.js',
+        'http://127.0.0.1:8000/scripts/feedback.html',
+    }
+
+
+def test_resume_from_state(website1, tmp_path):
+    state_path = str(tmp_path / 'state.db')
+    website1.limit = 2
+    website1.state_path = state_path
+    asyncio.run(website1.crawl())
+    finished = set(website1.results.keys())
+    assert len(finished) < 6
+
+    fetched = list()
+    site = sites.Site('http://127.0.0.1:8000/')
+    fetch = site.fetch
+
+    async def fetch_tracked(url, *args, **kwargs):
+        fetched.append(url)
+        return await fetch(url, *args, **kwargs)
+
+    site.fetch = fetch_tracked
+    asyncio.run(site.resume(state_path))
+    assert not finished & set(fetched)
+    assert set(site.results.keys()) == {
+        'http://127.0.0.1:8000/',
+        'http://127.0.0.1:8000/pages/contact.html',
+        'http://127.0.0.1:8000/pages/about.html',
+        'http://127.0.0.1:8000/pages/feedback.html',
+        'http://127.0.0.1:8000/js/script.js',
+        'http://127.0.0.1:8000/scripts/feedback.html',
+    }
+
+
+def test_conditional_recrawl(website2):
+    website2.store_headers = True
+    website2.store_links = True
+    asyncio.run(website2.crawl())
+    snapshot = dict(website2.results)
+    site = sites.Site('http://127.0.0.1:8000/', store_headers=True, store_links=True, previous=snapshot)
+    asyncio.run(site.crawl())
+    assert site.results == snapshot
+    report = site.recrawl_report()
+    assert report['not_modified'] == len(snapshot)
+    # The deduplicated http://127.0.0.1:8000/?arg=2 is not part of the snapshot
+    assert report['parses'] == 1
+    assert report['bytes_saved'] > 0
+
+
+def test_unchanged_recrawl(website2_with_body):
+    website2_with_body.store_links = True
+    asyncio.run(website2_with_body.crawl())
+    snapshot = dict(website2_with_body.results)
+    site = sites.Site('http://127.0.0.1:8000/', store_content=True, store_links=True, previous=snapshot)
+    asyncio.run(site.crawl())
+    assert site.results == snapshot
+    assert site.recrawl['unchanged'] == len(snapshot)
+    assert site.recrawl['parses'] == 1
+
+
+def test_scheduler(website1):
+    website1.scheduler = schedulers.Scheduler(rate=100, burst=4, concurrency=2)
+    asyncio.run(website1.crawl())
+    assert set(website1.results.keys()) == {
+        'http://127.0.0.1:8000/',
+        'http://127.0.0.1:8000/pages/contact.html',
+        'http://127.0.0.1:8000/pages/about.html',
+        'http://127.0.0.1:8000/pages/feedback.html',
+        'http://127.0.0.1:8000/js/script.js',
+        'http://127.0.0.1:8000/scripts/feedback.html',
+    }
+
+
+def test_priority_frontier_max_depth(website1):
+    website1.frontier = frontiers.PriorityFrontier(max_depth=1)
+    asyncio.run(website1.crawl())
+    assert set(website1.results.keys()) == {
+        'http://127.0.0.1:8000/',
+        'http://127.0.0.1:8000/pages/contact.html',
+        'http://127.0.0.1:8000/pages/about.html',
+        'http://127.0.0.1:8000/pages/feedback.html',
+        'http://127.0.0.1:8000/js/script.js',
+    }
+
+
+@pytest.mark.parametrize('executor_class', (None, futures.ProcessPoolExecutor))
+def test_stats(website1, tmp_path, executor_class):
+    stats_path = str(tmp_path / 'stats.jsonl')
+    website1.stats = stats.Stats(stats_path)
+    if executor_class is None:
+        asyncio.run(website1.crawl())
+    else:
+        with executor_class(max_workers=2) as executor:
+            website1.executor = executor
+            asyncio.run(website1.crawl())
+    snapshot = json.loads(open(stats_path).read().splitlines()[-1])
+    assert snapshot['counters']['pages'] == len(website1.results) == 6
+    assert snapshot['gauges']['frontier_size'] == 0
+    for name in ('fetch', 'ttfb', 'connect', 'body', 'queue_add', 'worker_idle', 'node_parse', 'node_extract', 'node_resolve'):
+        assert snapshot['timings'][name]['count'] > 0
+    # /index.html is parsed before being dropped as a duplicate of /
+    assert snapshot['timings']['node_parse']['count'] == 7
+
+
+def fake_site(links_no=20, delay=0.01, failing=(), slow=(), **options):
+    site = sites.Site('https://example.com/', **options)
+    site.fetched = list()
+    site.concurrency = 0
+    site.max_concurrency = 0
+
+    async def fetch(url, on_chunk=None, previous=None):
+        site.fetched.append(url)
+        site.concurrency += 1
+        site.max_concurrency = max(site.max_concurrency, site.concurrency)
+        try:
+            await asyncio.sleep(60 if url in slow else delay)
+            if url in failing:
+                raise RuntimeError(url)
+            if url == site.base:
+                body = ''.join('<a href="/{}.html">{}</a>'.format(i, i) for i in range(links_no))
+            else:
+                body = url
+            return body.encode(), 'utf-8', 'text/html', dict()
+        finally:
+            site.concurrency -= 1
+
+    site.fetch = fetch
+    return site
+
+
+def test_workers_wait_for_links():
+    site = fake_site(workers_no=8, limit=0)
+    asyncio.run(site.crawl())
+    assert len(site.results) == 21
+    assert site.max_concurrency == 8
+
+
+def test_limit_not_overshot():
+    site = fake_site(workers_no=8, limit=5)
+    asyncio.run(site.crawl())
+    assert len(site.results) == 5
+    assert len(site.fetched) == 5
+
+
+def test_failed_requests_release_budget():
+    failing = {'https://example.com/{}.html'.format(i) for i in range(4)}
+    site = fake_site(workers_no=8, limit=6, failing=failing)
+    asyncio.run(site.crawl())
+    assert len(site.results) == 6
+    assert not failing & set(site.results)
+
+
+def test_deadline_drains():
+    slow = {'https://example.com/0.html'}
+    site = fake_site(workers_no=4, limit=0, slow=slow, deadline=0.5, drain_timeout=0.1)
+    asyncio.run(asyncio.wait_for(site.crawl(), 5))
+    assert len(site.results) == 20
+    assert not slow & set(site.results)
+
+
+def test_cancelled_claims_released(tmp_path):
+    frontier = frontiers.SQLiteFrontier(str(tmp_path / 'frontier.db'))
+    slow = {'https://example.com/0.html'}
+    site = fake_site(links_no=3, workers_no=4, limit=0, slow=slow, deadline=0.5, drain_timeout=0.1, frontier=frontier)
+    asyncio.run(asyncio.wait_for(site.crawl(), 5))
+    statuses = dict(frontier.connection.execute('SELECT url, status FROM frontier'))
+    frontier.close()
+    assert statuses['https://example.com/0.html'] == frontiers.SQLiteFrontier.QUEUED
+    assert {url for url, status in statuses.items() if status == frontiers.SQLiteFrontier.DONE} == set(site.results)
+
+
+def test_unfetched_claims_dropped(tmp_path):
+    frontier = frontiers.SQLiteFrontier(str(tmp_path / 'frontier.db'))
+    site = fake_site(links_no=5, workers_no=1, limit=2, frontier=frontier)
+    asyncio.run(asyncio.wait_for(site.crawl(), 5))
+    statuses = dict(frontier.connection.execute('SELECT url, status FROM frontier'))
+    frontier.close()
+    assert {url for url, status in statuses.items() if status == frontiers.SQLiteFrontier.DONE} == set(site.results)
+    assert set(statuses.values()) == {frontiers.SQLiteFrontier.DONE, frontiers.SQLiteFrontier.DROPPED}
+
+
+def test_interrupted_drain_ends_crawl():
+    slow = {'https://example.com/0.html'}
+    site = fake_site(workers_no=4, limit=0, slow=slow, drain_timeout=0.1)
+
+    async def run():
+        crawl = asyncio.create_task(site.crawl())
+        await asyncio.sleep(0.3)
+        await site.drain()
+        await asyncio.wait_for(crawl, 2)
+
+    asyncio.run(run())
+    assert 'https://example.com/0.html' not in site.results
+
+
+def test_compact_results(website2_with_body):
+    asyncio.run(website2_with_body.crawl())
+    expected = dict(website2_with_body.results)
+    compact = sites.Site(website2_with_body.base, store_content=True, compact=True)
+    asyncio.run(compact.crawl())
+    assert isinstance(compact.checksums_index, records.DigestIndex)
+    assert dict(compact.results) == expected
+
+
+def test_parse_cache(website1):
+    website1.parse_cache = caches.ParseCache()
+    asyncio.run(website1.crawl())
+    assert set(website1.results.keys()) == {
+        'http://127.0.0.1:8000/',
+        'http://127.0.0.1:8000/pages/contact.html',
+        'http://127.0.0.1:8000/pages/about.html',
+        'http://127.0.0.1:8000/pages/feedback.html',
+        'http://127.0.0.1:8000/js/script.js',
+        'http://127.0.0.1:8000/scripts/feedback.html',
+    }
+    # /index.html serves the same bytes as /
+    assert website1.parse_cache.hits == 1
+
+
+def test_parse_cache_closed_on_stop(tmp_path):
+    site = fake_site(parse_cache=caches.ParseCache(path=str(tmp_path / 'parses.db')))
+    asyncio.run(site.crawl())
+    assert site.parse_cache.connection is None
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from digslash import stats
+
+
+def test_observe():
+    collected = stats.Stats()
+    collected.observe('fetch', 0.5)
+    collected.observe('fetch', 1.5)
+    collected.incr('pages', 2)
+    collected.gauge('frontier_size', 7)
+    snapshot = collected.snapshot()
+    assert snapshot['timings']['fetch'] == {'count': 2, 'total': 2.0, 'mean': 1.0, 'max': 1.5}
+    assert snapshot['counters'] == {'pages': 2}
+    assert snapshot['gauges'] == {'frontier_size': 7}
+
+
+def test_prometheus_format():
+    collected = stats.Stats()
+    collected.observe('fetch', 0.25)
+    collected.incr('pages')
+    collected.gauge('frontier_size', 3)
+    text = collected.to_prometheus()
+    assert '# TYPE digslash_pages_total counter\ndigslash_pages_total 1\n' in text
+    assert 'digslash_frontier_size 3\n' in text
+    assert 'digslash_fetch_seconds_count 1\ndigslash_fetch_seconds_sum 0.25\n' in text
+    assert 'digslash_fetch_seconds_max 0.25\n' in text
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        stats.Stats(format='csv')
+
+
+def test_periodic_snapshots(tmp_path):
+    path = str(tmp_path / 'stats.prom')
+
+    async def run():
+        collected = stats.Stats(path, interval=0.01, format='prometheus')
+        collected.start()
+        collected.start()
+        collected.incr('pages')
+        await asyncio.sleep(0.05)
+        await collected.stop()
+        # Still in use by the second site
+        assert collected.reporter is not None
+        await collected.stop()
+        assert collected.reporter is None
+
+    asyncio.run(run())
+    assert 'digslash_pages_total 1' in open(path).read()
@@ -0,0 +1,62 @@
+import pickle
+import urllib.parse
+
+import pytest
+
+from digslash import (
+    sites,
+    urls,
+)
+
+
+@pytest.fixture
+def resolver():
+    return urls.Resolver('https://example.com/', sites.Site.PATHS_IGNORED)
+
+
+@pytest.mark.parametrize('link,expected', (
+    ('contact.html', 'https://example.com/pages/contact.html'),
+    ('../home.html', 'https://example.com/home.html'),
+    ('../../../home.html', 'https://example.com/home.html'),
+    ('?arg=2', 'https://example.com/pages/about.html?arg=2'),
+    ('/a/./b/../c', 'https://example.com/a/c'),
+    ('HTTPS://EXAMPLE.COM:443/Path', 'https://example.com/Path'),
+    ('http://example.com/vendor.js', 'https://example.com/vendor.js'),
+    ('//example.com/vendor.js', 'https://example.com/vendor.js'),
+    ('/search?b=2&a=1&c=3', 'https://example.com/search?a=1&b=2&c=3'),
+    ('http://example.com', 'https://example.com/'),
+    ('https://example.com:8443/', None),
+    ('http://example.net/', None),
+    ('mailto:test@example.com', None),
+    ('javascript:void(0)', None),
+    ('#top', None),
+    ('page.html#top', None),
+    ('page.html\' + SOMETHING + \'', None),
+))
+def test_resolve(resolver, link, expected):
+    current = urllib.parse.urlsplit('https://example.com/pages/about.html')
+    assert resolver.resolve(link, current) == expected
+
+
+def test_resolve_keep_query_order():
+    resolver = urls.Resolver('https://example.com/', sort_query=False)
+    current = urllib.parse.urlsplit('https://example.com/')
+    assert resolver.resolve('/search?b=2&a=1', current) == 'https://example.com/search?b=2&a=1'
+
+
+def test_resolve_cache_shared_across_pages(resolver):
+    for page in ('/', '/pages/about.html', '/pages/contact.html'):
+        current = urllib.parse.urlsplit('https://example.com' + page)
+        resolver.resolve('/pages/about.html', current)
+        resolver.resolve('about.html', current)
+    info = resolver.cache_info()
+    assert info.hits == 2
+    assert info.misses == 4
+
+
+def test_resolver_unpickled_once_per_process(resolver):
+    current = urllib.parse.urlsplit('https://example.com/')
+    pickle.loads(pickle.dumps(resolver)).resolve('/pages/about.html', current)
+    restored = pickle.loads(pickle.dumps(resolver))
+    restored.resolve('/pages/about.html', current)
+    assert restored.cache_info().hits == 1